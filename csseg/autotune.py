@@ -0,0 +1,126 @@
+'''
+Function:
+    Implementation of Autotuner, which searches the fastest dataloader settings of a config on the current machine
+Author:
+    Zhenchao Jin
+'''
+import os
+import json
+import time
+import copy
+import torch
+import socket
+import warnings
+import argparse
+import torch.distributed as dist
+from configs import BuildConfig
+from modules import BuildDataset, BuildDistributedDataloader, Logger
+warnings.filterwarnings('ignore')
+
+
+'''parsecmdargs'''
+def parsecmdargs():
+    parser = argparse.ArgumentParser(description='CSSegmentation: An Open Source Continual Semantic Segmentation Toolbox Based on PyTorch.')
+    parser.add_argument('--cfgfilepath', dest='cfgfilepath', help='config file path you want to load.', type=str, required=True)
+    parser.add_argument('--outputpath', dest='outputpath', help='json file to save the fastest dataloader settings.', default='autotuned_dataloader.json', type=str)
+    parser.add_argument('--logfilepath', dest='logfilepath', help='file to save the logs of autotuning.', default='autotune.log', type=str)
+    parser.add_argument('--modes', dest='modes', help='dataset modes you want to tune.', nargs='+', default=['TRAIN', 'TEST'], type=str)
+    parser.add_argument('--taskid', dest='taskid', help='task id whose dataset is used for benchmarking.', default=0, type=int)
+    parser.add_argument('--nproc_per_node', dest='nproc_per_node', help='number of training processes which share the cpus of this machine.', default=1, type=int)
+    parser.add_argument('--timebudget', dest='timebudget', help='time budget of each mode in seconds.', default=300, type=float)
+    parser.add_argument('--numbatches', dest='numbatches', help='number of batches loaded in each of the two passes of a trial.', default=20, type=int)
+    parser.add_argument('--numworkers', dest='numworkers', help='candidates of num_workers_per_gpu.', nargs='+', default=None, type=int)
+    parser.add_argument('--prefetchfactors', dest='prefetchfactors', help='candidates of prefetch_factor.', nargs='+', default=[2, 4, 8], type=int)
+    cmd_args = parser.parse_args()
+    return cmd_args
+
+
+'''Autotuner'''
+class Autotuner():
+    def __init__(self, cmd_args):
+        self.cmd_args = cmd_args
+        self.cfg = BuildConfig(cmd_args.cfgfilepath)[0]
+        self.logger_handle = Logger(logfilepath=cmd_args.logfilepath)
+    '''start'''
+    def start(self):
+        cmd_args, runner_cfg = self.cmd_args, self.cfg.RUNNER_CFG
+        # the datasets synchronize their caches through torch.distributed, a single process group on a free local port is enough here
+        is_initialized = dist.is_initialized()
+        if not is_initialized:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind(('127.0.0.1', 0))
+                port = sock.getsockname()[1]
+            dist.init_process_group(backend='gloo', init_method=f'tcp://127.0.0.1:{port}', rank=0, world_size=1)
+        dataset_cfg, dataloader_cfg = runner_cfg['dataset_cfg'], runner_cfg['dataloader_cfg']
+        if isinstance(dataset_cfg, list): dataset_cfg = dataset_cfg[cmd_args.taskid]
+        if isinstance(dataloader_cfg, list): dataloader_cfg = dataloader_cfg[cmd_args.taskid]
+        dataloader_cfg = {key: value for key, value in copy.deepcopy(dataloader_cfg).items() if key not in ['autotuned_cfg_path']}
+        if dataloader_cfg.get('auto_align_train_bs', False):
+            dataloader_cfg['train']['batch_size_per_gpu'] = dataloader_cfg['total_train_bs_for_auto_check'] // cmd_args.nproc_per_node
+        results = {'hostname': socket.gethostname(), 'cpu_count': os.cpu_count(), 'nproc_per_node': cmd_args.nproc_per_node}
+        for mode in cmd_args.modes:
+            assert mode in ['TRAIN', 'TEST']
+            dataset = BuildDataset(mode=mode, task_name=runner_cfg['task_name'], task_id=cmd_args.taskid, dataset_cfg=dataset_cfg)
+            results[mode.lower()] = self.todataloadercfg(self.tune(dataset, dataloader_cfg, mode))
+            self.logger_handle.info(f'Fastest {mode} dataloader settings: {results[mode.lower()]}')
+        with open(cmd_args.outputpath, 'w') as fp:
+            json.dump(results, fp, indent=4)
+        self.logger_handle.info(f'Save autotuned dataloader settings into {os.path.abspath(cmd_args.outputpath)}, set it as autotuned_cfg_path in the dataloader_cfg to use them')
+        if not is_initialized:
+            dist.destroy_process_group()
+    '''tune'''
+    def tune(self, dataset, dataloader_cfg, mode):
+        cmd_args = self.cmd_args
+        deadline = time.time() + cmd_args.timebudget
+        max_workers = max(1, (os.cpu_count() or 1) // cmd_args.nproc_per_node)
+        num_workers_candidates = cmd_args.numworkers or sorted(set([0] + [2**i for i in range(max_workers.bit_length()) if 2**i <= max_workers] + [max_workers]))
+        best = {
+            'num_workers_per_gpu': dataloader_cfg[mode.lower()]['num_workers_per_gpu'], 'prefetch_factor': 2, 'persistent_workers': False,
+            'pin_memory': torch.cuda.is_available() and dataloader_cfg[mode.lower()].get('pin_memory', True),
+        }
+        best_throughput = self.benchmark(dataset, dataloader_cfg, mode, best)
+        self.logger_handle.info(f'{mode} {best}: {best_throughput:.2f} samples/s')
+        # coordinate search, every option is tuned with the best values found so far for the others
+        search_space = [('num_workers_per_gpu', num_workers_candidates), ('prefetch_factor', cmd_args.prefetchfactors), ('persistent_workers', [False, True])]
+        if torch.cuda.is_available(): search_space.append(('pin_memory', [False, True]))
+        for key, candidates in search_space:
+            for candidate in candidates:
+                if time.time() > deadline: return best
+                if candidate == best[key] or (key in ['prefetch_factor', 'persistent_workers'] and best['num_workers_per_gpu'] == 0): continue
+                settings = {**best, key: candidate}
+                throughput = self.benchmark(dataset, dataloader_cfg, mode, settings)
+                self.logger_handle.info(f'{mode} {settings}: {throughput:.2f} samples/s')
+                if throughput > best_throughput:
+                    best, best_throughput = settings, throughput
+        return best
+    '''benchmark'''
+    def benchmark(self, dataset, dataloader_cfg, mode, settings):
+        dataloader_cfg = copy.deepcopy(dataloader_cfg)
+        dataloader_cfg[mode.lower()].update(self.todataloadercfg(settings))
+        dataloader = BuildDistributedDataloader(dataset=dataset, dataloader_cfg=dataloader_cfg)
+        # two short passes, so that the startup cost of non-persistent workers is measured as well
+        num_samples, start_time = 0, time.perf_counter()
+        for epoch in range(2):
+            sampler = dataloader.dataset if isinstance(dataloader.dataset, torch.utils.data.IterableDataset) else dataloader.sampler
+            sampler.set_epoch(epoch)
+            for batch_idx, data_meta in enumerate(dataloader):
+                num_samples += data_meta['image'].shape[0]
+                if batch_idx + 1 >= self.cmd_args.numbatches: break
+        throughput = num_samples / (time.perf_counter() - start_time)
+        del dataloader
+        return throughput
+    '''todataloadercfg'''
+    @staticmethod
+    def todataloadercfg(settings):
+        settings = copy.deepcopy(settings)
+        if settings['num_workers_per_gpu'] == 0:
+            settings.pop('prefetch_factor')
+            settings.pop('persistent_workers')
+        return settings
+
+
+'''main'''
+if __name__ == '__main__':
+    cmd_args = parsecmdargs()
+    autotuner_client = Autotuner(cmd_args=cmd_args)
+    autotuner_client.start()
@@ -0,0 +1,70 @@
+'''
+Function:
+    Implementation of Benchmarker, which measures the decoding throughput of the image decoders on a dataset split
+Author:
+    Zhenchao Jin
+'''
+import time
+import warnings
+import argparse
+import numpy as np
+from configs import BuildConfig
+from modules import BuildDataGenerator, BuildImageDecoder, ImageDecoderBuilder, Logger
+warnings.filterwarnings('ignore')
+
+
+'''parsecmdargs'''
+def parsecmdargs():
+    parser = argparse.ArgumentParser(description='CSSegmentation: An Open Source Continual Semantic Segmentation Toolbox Based on PyTorch.')
+    parser.add_argument('--cfgfilepath', dest='cfgfilepath', help='config file path you want to load.', type=str, required=True)
+    parser.add_argument('--mode', dest='mode', help='dataset mode you want to benchmark.', default='TRAIN', choices=['TRAIN', 'TEST'], type=str)
+    parser.add_argument('--decoders', dest='decoders', help='image decoders you want to benchmark.', nargs='+', default=list(ImageDecoderBuilder.REGISTERED_MODULES.keys()), type=str)
+    parser.add_argument('--numimages', dest='numimages', help='number of images decoded by each decoder.', default=200, type=int)
+    parser.add_argument('--logfilepath', dest='logfilepath', help='file to save the logs of benchmarking.', default='benchmark.log', type=str)
+    cmd_args = parser.parse_args()
+    return cmd_args
+
+
+'''Benchmarker'''
+class Benchmarker():
+    def __init__(self, cmd_args):
+        self.cmd_args = cmd_args
+        self.cfg = BuildConfig(cmd_args.cfgfilepath)[0]
+        self.logger_handle = Logger(logfilepath=cmd_args.logfilepath)
+    '''start'''
+    def start(self):
+        cmd_args, dataset_cfg = self.cmd_args, self.cfg.RUNNER_CFG['dataset_cfg']
+        if isinstance(dataset_cfg, list): dataset_cfg = dataset_cfg[0]
+        data_generator = BuildDataGenerator(mode=cmd_args.mode, dataset_cfg={key: value for key, value in dataset_cfg.items() if key not in ['packed_cfg', 'tar_cfg']})
+        # the encoded images are loaded into memory first, so that only decoding is measured
+        sources = []
+        for imageid in data_generator.imageids[:cmd_args.numimages]:
+            with open(data_generator.getimagepath(imageid), 'rb') as fp:
+                sources.append(fp.read())
+        references = [np.array(BuildImageDecoder({'type': 'PILImageDecoder'})(source)) for source in sources]
+        num_bytes = sum(len(source) for source in sources)
+        self.logger_handle.info(f'Benchmark decoding {len(sources)} images ({num_bytes / 1024**2:.2f} MB) of the {cmd_args.mode} set of {dataset_cfg["type"]}')
+        for decoder_type in cmd_args.decoders:
+            decoder = BuildImageDecoder({'type': decoder_type})
+            # raw images are decoded from the uint8 pixels, the same as packed shards with image_format='raw'
+            if decoder_type == 'RawImageDecoder':
+                inputs = [(reference.tobytes(), reference.shape) for reference in references]
+            else:
+                inputs = [(source, None) for source in sources]
+            start_time = time.perf_counter()
+            images = [np.array(decoder(source, shape=shape)) for source, shape in inputs]
+            elapsed_time = time.perf_counter() - start_time
+            # decoders may link other libjpeg builds than PIL, so their outputs are close to but not always the same as those of PILImageDecoder
+            diffs = [np.abs(image.astype(np.int16) - reference) if image.shape == reference.shape else np.full((1,), 255) for image, reference in zip(images, references)]
+            max_diff, mean_diff = max(int(diff.max()) for diff in diffs), float(np.mean([diff.mean() for diff in diffs]))
+            self.logger_handle.info(
+                f'{decoder_type}: {len(images) / elapsed_time:.2f} images/s, {num_bytes / 1024**2 / elapsed_time:.2f} MB/s, '
+                f'max abs difference to PILImageDecoder: {max_diff}, mean abs difference to PILImageDecoder: {mean_diff:.4f}'
+            )
+
+
+'''main'''
+if __name__ == '__main__':
+    cmd_args = parsecmdargs()
+    benchmarker_client = Benchmarker(cmd_args=cmd_args)
+    benchmarker_client.start()
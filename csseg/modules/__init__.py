@@ -2,7 +2,8 @@
 from .runners import BuildRunner, RunnerBuilder
 from .parallel import BuildDistributedDataloader, BuildDistributedModel
 from .datasets import (
-    SegmentationEvaluator, BuildDataTransform, DataTransformBuilder, BuildDataset, DatasetBuilder
+    SegmentationEvaluator, BuildDataTransform, DataTransformBuilder, BuildBatchTransform, BatchTransformBuilder, BuildDataset, DatasetBuilder, BuildDataGenerator, LabelIndex, SharedImageCache,
+    BuildImageDecoder, ImageDecoderBuilder, ReadAhead
 )
 from .utils import (
     setrandomseed, saveckpts, loadckpts, touchdir, saveaspickle, loadpicklefile, symlink, loadpretrainedweights,
@@ -1,3 +1,7 @@
 '''initialize'''
-from .builder import DatasetBuilder, BuildDataset
-from .pipelines import SegmentationEvaluator, BuildDataTransform, DataTransformBuilder
\ No newline at end of file
+from .labelindex import LabelIndex
+from .readahead import ReadAhead
+from .imagecache import SharedImageCache
+from .decoders import BuildImageDecoder, ImageDecoderBuilder
+from .builder import DatasetBuilder, BuildDataset, BuildDataGenerator
+from .pipelines import SegmentationEvaluator, BuildDataTransform, DataTransformBuilder, BuildBatchTransform, BatchTransformBuilder
\ No newline at end of file
@@ -4,15 +4,24 @@ Function:
 Author:
     Zhenchao Jin
 '''
+import io
 import os
 import copy
 import torch
+import atexit
+import tempfile
+import itertools
 import collections
 import torchvision
 import numpy as np
+import torch.distributed as dist
 from PIL import Image
-from tqdm import tqdm
-from .pipelines import SegmentationEvaluator, Compose, BuildDataTransform, DataTransformBuilder
+from .labelindex import LabelIndex
+from .readahead import ReadAhead
+from .tensorcache import TensorCache
+from .imagecache import SharedImageCache
+from .decoders import BuildImageDecoder
+from .pipelines import SegmentationEvaluator, Compose, BuildDataTransform, DataTransformBuilder, BuildBatchTransform
 
 
 '''Subset'''
@@ -23,9 +32,22 @@ class Subset(torch.utils.data.Dataset):
         self.indices = indices
         self.transforms = transforms
         self.seg_target_transforms = seg_target_transforms
+        self.num_repeats = 1
     '''getitem'''
     def __getitem__(self, index):
+        # with a resolution schedule, the batch sampler passes the output size of the batch along with each index
+        output_size = None
+        if isinstance(index, tuple):
+            index, output_size = index
         data_meta = self.dataset[self.indices[index]]
+        if output_size is not None:
+            data_meta['output_size'] = output_size
+        # repeated augmentation, several independently transformed views of one decoded image
+        if self.num_repeats > 1:
+            return [self.process(dict(data_meta)) for _ in range(self.num_repeats)]
+        return self.process(data_meta)
+    '''process'''
+    def process(self, data_meta):
         data_meta = self.transforms(data_meta) if self.transforms is not None else data_meta
         if 'seg_target' in data_meta and data_meta['seg_target'] is not None:
             data_meta['seg_target'] = self.seg_target_transforms(data_meta['seg_target']) if self.seg_target_transforms is not None else data_meta['seg_target']
@@ -35,8 +57,76 @@ class Subset(torch.utils.data.Dataset):
         return len(self.indices)
 
 
+'''IterableSubset'''
+class IterableSubset(torch.utils.data.IterableDataset):
+    def __init__(self, dataset, indices, transforms=None, seg_target_transforms=None):
+        # set attributes
+        self.dataset = dataset
+        self.indices = indices
+        self.transforms = transforms
+        self.seg_target_transforms = seg_target_transforms
+        self.selected_imageids = set(dataset.imageids[idx] for idx in indices)
+        self.epoch, self.seed, self.shuffle = 0, 0, True
+        self.batch_size, self.drop_last, self.infinite = 1, False, False
+        self.num_replicas = dist.get_world_size() if dist.is_available() and dist.is_initialized() else 1
+        self.rank = dist.get_rank() if dist.is_available() and dist.is_initialized() else 0
+    '''iter'''
+    def __iter__(self):
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id, num_workers = (worker_info.id, worker_info.num_workers) if worker_info is not None else (0, 1)
+        # without shuffling (i.e., testing) every sample is yielded exactly once
+        if not self.shuffle:
+            rng_seed = [self.seed, self.epoch, 0, self.rank * num_workers + worker_id]
+            for data_meta in self.dataset.iterate(self.selected_imageids, rng_seed, False, self.rank * num_workers + worker_id, self.num_replicas * num_workers):
+                yield self.process(data_meta)
+            return
+        # in iteration-based training, the passes over the shards never end
+        if self.infinite:
+            for data_meta in self.iteratepasses(self.rank * num_workers + worker_id, self.num_replicas * num_workers):
+                yield self.process(data_meta)
+            return
+        # otherwise, every worker yields whole batches, so that all ranks run the same number of iterations
+        num_batches = self.numbatches()
+        quota = (num_batches // num_workers + int(worker_id < num_batches % num_workers)) * self.batch_size
+        for data_meta in itertools.islice(self.iteratepasses(self.rank * num_workers + worker_id, self.num_replicas * num_workers), quota):
+            yield self.process(data_meta)
+    '''iteratepasses'''
+    def iteratepasses(self, worker_id, num_workers):
+        # the shard order is reshuffled in every pass, so a global worker whose part has no selected images may get some in the next pass,
+        # after num_shards empty passes it reads the parts of all workers instead, so that it can still fill its quota of batches
+        num_empty_passes, max_empty_passes = 0, getattr(self.dataset, 'num_shards', 1)
+        for num_passes in itertools.count():
+            fallback = num_empty_passes >= max_empty_passes
+            rng_seed = [self.seed, self.epoch, num_passes, worker_id]
+            num_yielded = 0
+            for data_meta in self.dataset.iterate(self.selected_imageids, rng_seed, self.shuffle, 0 if fallback else worker_id, 1 if fallback else num_workers):
+                num_yielded += 1
+                yield data_meta
+            if num_yielded == 0:
+                if fallback: return
+                num_empty_passes += 1
+    '''process'''
+    def process(self, data_meta):
+        data_meta = self.transforms(data_meta) if self.transforms is not None else data_meta
+        if 'seg_target' in data_meta and data_meta['seg_target'] is not None:
+            data_meta['seg_target'] = self.seg_target_transforms(data_meta['seg_target']) if self.seg_target_transforms is not None else data_meta['seg_target']
+        return data_meta
+    '''numbatches'''
+    def numbatches(self):
+        num_samples = -(-len(self.indices) // self.num_replicas)
+        return num_samples // self.batch_size if self.drop_last else -(-num_samples // self.batch_size)
+    '''len'''
+    def __len__(self):
+        return self.numbatches() * self.batch_size
+    '''setepoch'''
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+
 '''_BaseDataset'''
 class _BaseDataset(torch.utils.data.Dataset):
+    streaming = False
+    file_based = True
     def __init__(self, mode, dataset_cfg):
         # assert
         assert mode in ['TRAIN', 'TEST']
@@ -45,21 +135,20 @@ class _BaseDataset(torch.utils.data.Dataset):
         self.dataset_cfg = dataset_cfg
         self.transforms = self.constructtransforms(dataset_cfg.get('transforms'))
         self.imageids, self.image_dir, self.ann_dir = [], '', ''
+        self.image_cache = None
+        self.draft_transforms = None
+        self.read_ahead = None
+        self.image_decoder = BuildImageDecoder(dataset_cfg.get('image_decoder_cfg', {'type': 'PILImageDecoder'}))
     '''getitem'''
     def __getitem__(self, index):
-        # prepare
-        imageid = self.imageids[index]
-        imagepath = os.path.join(self.image_dir, f'{imageid}.jpg')
-        annpath = os.path.join(self.ann_dir, f'{imageid}.png')
         # read image and seg_target
-        image, seg_target = Image.open(imagepath).convert('RGB'), None
-        if self.mode == 'TRAIN': assert os.path.exists(annpath)
-        if os.path.exists(annpath):
-            seg_target = Image.open(annpath)
-        # perform transforms
+        imageid = self.imageids[index]
+        image, seg_target = self.readcached(index)
+        # perform transforms, the seg_target keeps the full resolution if the image is decoded at a reduced one
+        width, height = seg_target.size if seg_target is not None else image.size
         data_meta = {
             'image': image, 'seg_target': seg_target, 'imageid': imageid,
-            'width': image.size[0], 'height': image.size[1],
+            'width': width, 'height': height,
         }
         data_meta = self.transforms(data_meta) if self.transforms is not None else data_meta
         # return
@@ -67,9 +156,61 @@ class _BaseDataset(torch.utils.data.Dataset):
     '''len'''
     def __len__(self):
         return len(self.imageids)
+    '''read'''
+    def read(self, index):
+        if self.read_ahead is not None:
+            # the raw bytes are usually fetched ahead by the threads of the read-ahead, only the decoding is left to the worker
+            image_bytes, seg_target_bytes = self.read_ahead.fetch(index, self.readbytes)
+            return self.openimage(image_bytes), (Image.open(io.BytesIO(seg_target_bytes)) if seg_target_bytes is not None else None)
+        imageid = self.imageids[index]
+        imagepath, annpath = self.getimagepath(imageid), self.getannpath(imageid)
+        image, seg_target = self.openimage(imagepath), None
+        if self.mode == 'TRAIN': assert os.path.exists(annpath)
+        if os.path.exists(annpath):
+            seg_target = Image.open(annpath)
+        return image, seg_target
+    '''readbytes'''
+    def readbytes(self, index):
+        imageid = self.imageids[index]
+        imagepath, annpath = self.getimagepath(imageid), self.getannpath(imageid)
+        if self.mode == 'TRAIN': assert os.path.exists(annpath)
+        seg_target_bytes = self.image_decoder.readbytes(annpath) if os.path.exists(annpath) else None
+        return self.image_decoder.readbytes(imagepath), seg_target_bytes
+    '''openimage'''
+    def openimage(self, source):
+        # decoders supporting it decode at a reduced resolution which still covers what the first transform needs
+        mindecodesize = self.draft_transforms.mindecodesize if self.draft_transforms is not None else None
+        return self.image_decoder(source, mindecodesize=mindecodesize)
+    '''readcached'''
+    def readcached(self, index):
+        if self.image_cache is None:
+            return self.read(index)
+        imageid = self.imageids[index]
+        cached = self.image_cache.get(imageid)
+        if cached is not None:
+            image, seg_target = cached
+            return Image.fromarray(image), (Image.fromarray(seg_target) if seg_target is not None else None)
+        image, seg_target = self.read(index)
+        image = np.array(image, dtype=np.uint8)
+        seg_target = np.array(seg_target, dtype=np.uint8) if seg_target is not None else None
+        self.image_cache.put(imageid, image, seg_target)
+        return Image.fromarray(image), (Image.fromarray(seg_target) if seg_target is not None else None)
+    '''getcachesignature'''
+    def getcachesignature(self):
+        signature = ':'.join([type(self).__name__, os.path.abspath(self.image_dir), os.path.abspath(self.ann_dir)])
+        return signature if self.draft_transforms is None else f'{signature}:draft'
+    '''buildlabelindex'''
+    def buildlabelindex(self, cache_dir=None, num_workers=None):
+        return LabelIndex.build(self, cache_dir=cache_dir, num_workers=num_workers)
+    '''getimagepath'''
+    def getimagepath(self, imageid):
+        return os.path.join(self.image_dir, f'{imageid}.jpg')
+    '''getannpath'''
+    def getannpath(self, imageid):
+        return os.path.join(self.ann_dir, f'{imageid}.png')
     '''constructtransforms'''
     @staticmethod
-    def constructtransforms(transform_settings):
+    def constructtransforms(transform_settings, build_transform_func=BuildDataTransform):
         if transform_settings is None: return None
         transforms = []
         for transform_setting in transform_settings:
@@ -80,11 +221,103 @@ class _BaseDataset(torch.utils.data.Dataset):
                 assert len(transform_setting) == 2
                 transform_type, transform_cfg = transform_setting
                 transform_cfg['type'] = transform_type
-            transform = BuildDataTransform(transform_cfg)
+            transform = build_transform_func(transform_cfg)
             transforms.append(transform)
         return Compose(transforms)
 
 
+'''_InMemoryDataset'''
+class _InMemoryDataset(_BaseDataset):
+    file_based = False
+    def __init__(self, mode, dataset_cfg, source_data_generator, indices, label_index, num_workers=None):
+        super(_InMemoryDataset, self).__init__(mode=mode, dataset_cfg=dataset_cfg)
+        # set attributes
+        self.num_classes = source_data_generator.num_classes
+        self.classnames = source_data_generator.classnames
+        self.image_dir, self.ann_dir = source_data_generator.image_dir, source_data_generator.ann_dir
+        self.imageids = [source_data_generator.imageids[idx] for idx in indices]
+        self.label_counts = label_index.label_counts
+        # the subset is decoded once per host into shared memory, and all ranks on the host map the same arrays
+        self.shmpath = self.getshmpath(source_data_generator.getcachesignature(), self.imageids)
+        is_distributed = dist.is_available() and dist.is_initialized()
+        if int(os.environ.get('LOCAL_RANK', dist.get_rank() if is_distributed else 0)) == 0:
+            atexit.register(self.destroy, self.shmpath)
+            self.load(source_data_generator, indices, num_workers)
+        if is_distributed:
+            dist.barrier()
+        index = np.load(f'{self.shmpath}.index.npz', allow_pickle=False)
+        self.image_offsets, self.image_shapes = index['image_offsets'], index['image_shapes']
+        self.seg_target_offsets, self.seg_target_shapes = index['seg_target_offsets'], index['seg_target_shapes']
+        self.images, self.seg_targets = None, None
+    '''load'''
+    def load(self, source_data_generator, indices, num_workers=None):
+        num_workers = num_workers if num_workers is not None else min(8, os.cpu_count() or 1)
+        # images are held at full resolution, since the output sizes of later transforms (e.g., of a progressive resolution schedule) are not known yet
+        draft_transforms, source_data_generator.draft_transforms = source_data_generator.draft_transforms, None
+        dataloader = torch.utils.data.DataLoader(
+            torch.utils.data.Subset(source_data_generator, indices), batch_size=None, shuffle=False, num_workers=num_workers,
+        )
+        # decode all images once into two flat uint8 arrays, sized by the pixel counts of the seg_targets
+        num_pixels = int(self.label_counts.sum())
+        images = np.lib.format.open_memmap(f'{self.shmpath}.images.npy', mode='w+', dtype=np.uint8, shape=(max(num_pixels * 3, 1),))
+        seg_targets = np.lib.format.open_memmap(f'{self.shmpath}.segtargets.npy', mode='w+', dtype=np.uint8, shape=(max(num_pixels, 1),))
+        image_offsets, seg_target_offsets = np.zeros((len(indices),), dtype=np.int64), np.zeros((len(indices),), dtype=np.int64)
+        image_shapes, seg_target_shapes = np.zeros((len(indices), 3), dtype=np.int64), np.zeros((len(indices), 2), dtype=np.int64)
+        image_offset, seg_target_offset = 0, 0
+        for idx, data_meta in enumerate(dataloader):
+            image, seg_target = np.asarray(data_meta['image'], dtype=np.uint8), np.asarray(data_meta['seg_target'], dtype=np.uint8)
+            image_offsets[idx], image_shapes[idx] = image_offset, image.shape
+            images[image_offset: image_offset + image.size] = image.ravel()
+            seg_target_offsets[idx], seg_target_shapes[idx] = seg_target_offset, seg_target.shape
+            seg_targets[seg_target_offset: seg_target_offset + seg_target.size] = seg_target.ravel()
+            image_offset, seg_target_offset = image_offset + image.size, seg_target_offset + seg_target.size
+        source_data_generator.draft_transforms = draft_transforms
+        images.flush()
+        seg_targets.flush()
+        del images, seg_targets
+        np.savez(
+            f'{self.shmpath}.index.npz', image_offsets=image_offsets, image_shapes=image_shapes, seg_target_offsets=seg_target_offsets, seg_target_shapes=seg_target_shapes,
+        )
+    '''read'''
+    def read(self, index):
+        if self.images is None:
+            self.images = np.load(f'{self.shmpath}.images.npy', mmap_mode='r')
+            self.seg_targets = np.load(f'{self.shmpath}.segtargets.npy', mmap_mode='r')
+        image_offset, image_shape = int(self.image_offsets[index]), tuple(self.image_shapes[index])
+        seg_target_offset, seg_target_shape = int(self.seg_target_offsets[index]), tuple(self.seg_target_shapes[index])
+        image = self.images[image_offset: image_offset + int(np.prod(image_shape))].reshape(image_shape)
+        seg_target = self.seg_targets[seg_target_offset: seg_target_offset + int(np.prod(seg_target_shape))].reshape(seg_target_shape)
+        return Image.fromarray(image), Image.fromarray(seg_target)
+    '''readcached'''
+    def readcached(self, index):
+        return self.read(index)
+    '''getstate'''
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['images'], state['seg_targets'] = None, None
+        return state
+    '''getshmpath'''
+    @staticmethod
+    def getshmpath(signature, imageids):
+        shm_dir = '/dev/shm' if os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+        return os.path.join(shm_dir, SharedImageCache.getname('\n'.join([signature] + list(imageids))) + '_inmemory')
+    '''destroy'''
+    @staticmethod
+    def destroy(shmpath):
+        for suffix in ['.images.npy', '.segtargets.npy', '.index.npz']:
+            if os.path.exists(f'{shmpath}{suffix}'): os.remove(f'{shmpath}{suffix}')
+    '''buildlabelindex'''
+    def buildlabelindex(self, cache_dir=None, num_workers=None):
+        return LabelIndex(imageids=self.imageids, label_counts=self.label_counts)
+    '''estimatenbytes'''
+    @staticmethod
+    def estimatenbytes(label_index):
+        # the pixel counts of the seg_targets give the decoded size, three bytes per image pixel and one per seg_target pixel
+        num_pixels = label_index.label_counts.sum(axis=1).astype(np.int64)
+        if (num_pixels == 0).any(): return None
+        return int(num_pixels.sum()) * 4
+
+
 '''BaseDataset'''
 class BaseDataset(torch.utils.data.Dataset):
     def __init__(self, mode, task_name, task_id, dataset_cfg):
@@ -99,14 +332,61 @@ class BaseDataset(torch.utils.data.Dataset):
         dataset_cfg_g.pop('transforms')
         self.data_generator = self.builddatagenerator(mode, dataset_cfg_g)
         self.num_classes = self.data_generator.num_classes
-        self.transforms = self.data_generator.constructtransforms(dataset_cfg['transforms'])
+        transform_settings, batch_transform_settings = dataset_cfg['transforms'], dataset_cfg.get('batch_transforms')
+        if dataset_cfg.get('normalize_on_device', False):
+            transform_settings, batch_transform_settings = self.movenormalizetodevice(transform_settings, batch_transform_settings)
+        self.transforms = self.data_generator.constructtransforms(transform_settings)
+        self.batch_transforms = self.data_generator.constructtransforms(batch_transform_settings, build_transform_func=BuildBatchTransform)
+        if dataset_cfg.get('jpeg_draft', False):
+            self.data_generator.draft_transforms = self.transforms
+        self.image_cache = None
+        self.in_memory, self.in_process = False, False
+        self.num_repeats = dataset_cfg.get('repeated_aug_cfg', {}).get('num_repeats', 1) if mode == 'TRAIN' else 1
         # prepare for training
         self.prepare(dataset_cfg, self.transforms, self.data_generator)
+        # streaming datasets can only be read sequentially, so the options which need random access to the samples are rejected
+        if isinstance(self.data_generator, IterableSubset):
+            for key in ['tensor_cache', 'in_memory_cfg', 'repeated_aug_cfg', 'read_ahead_cfg']:
+                assert not dataset_cfg.get(key), f'{key} is not supported by streaming datasets (tar_cfg), use packed_cfg for random access instead'
+        # the deterministic test pipeline is materialized once and read back without decoding
+        if mode == 'TEST' and dataset_cfg.get('tensor_cache', False) and isinstance(self.data_generator, Subset):
+            tensor_cache = TensorCache.build(
+                self.data_generator, transform_settings=dataset_cfg['transforms'], lut=self.labels_to_trainlabels_lut,
+                cache_dir=dataset_cfg.get('cache_dir') or os.path.join(dataset_cfg['rootdir'], '.cache'), num_workers=dataset_cfg.get('index_num_workers'),
+            )
+            self.data_generator = tensor_cache if tensor_cache is not None else self.data_generator
+        # small subsets, e.g., those of the later incremental tasks, are decoded once and served from memory
+        in_memory_cfg = dataset_cfg.get('in_memory_cfg')
+        if in_memory_cfg is not None and isinstance(self.data_generator, Subset) and not isinstance(self.data_generator.dataset, _InMemoryDataset):
+            num_bytes = _InMemoryDataset.estimatenbytes(self.subset_label_index)
+            if num_bytes is not None and num_bytes <= in_memory_cfg['max_bytes']:
+                in_memory_data_generator = _InMemoryDataset(
+                    mode=mode, dataset_cfg=self.data_generator.dataset.dataset_cfg, source_data_generator=self.data_generator.dataset, indices=self.data_generator.indices,
+                    label_index=self.subset_label_index, num_workers=dataset_cfg.get('index_num_workers'),
+                )
+                self.data_generator = Subset(in_memory_data_generator, list(range(len(self.data_generator))), self.data_generator.transforms, self.data_generator.seg_target_transforms)
+                self.in_memory, self.in_process = True, in_memory_cfg.get('in_process', False)
+        if self.num_repeats > 1:
+            self.data_generator.num_repeats = self.num_repeats
+        # on high-latency storage, the raw bytes of the upcoming samples are fetched by threads ahead of the decoding
+        self.read_ahead = None
+        read_ahead_cfg = dataset_cfg.get('read_ahead_cfg')
+        if read_ahead_cfg is not None and isinstance(self.data_generator, Subset) and self.data_generator.dataset.file_based:
+            self.read_ahead = ReadAhead(**read_ahead_cfg)
+            self.data_generator.dataset.read_ahead = self.read_ahead
     '''getitem'''
     def __getitem__(self, index):
         return self.data_generator[index]
+    '''setimagecache'''
+    def setimagecache(self, image_cache):
+        self.image_cache = image_cache
+        self.data_generator.dataset.image_cache = image_cache
+    '''getcachesignature'''
+    def getcachesignature(self):
+        return self.data_generator.dataset.getcachesignature()
     '''builddatagenerator'''
-    def builddatagenerator(self, mode, dataset_cfg):
+    @classmethod
+    def builddatagenerator(cls, mode, dataset_cfg):
         raise NotImplementedError('not to be implemented')
     '''prepare'''
     def prepare(self, dataset_cfg, transforms, data_generator):
@@ -124,15 +404,56 @@ class BaseDataset(torch.utils.data.Dataset):
         self.labels = [0] + labels
         self.history_labels = [0] + history_labels
         self.all_labels = [0] + history_labels + labels
-        selected_indices = self.filterimages(data_generator, labels, history_labels, overlap)
+        # class-aware transforms bias their sampling towards the classes of the current task
+        for transform in (transforms.transforms if transforms is not None else []):
+            if hasattr(transform, 'setlabels'): transform.setlabels(labels)
+        self.label_index = data_generator.buildlabelindex(cache_dir=dataset_cfg.get('cache_dir'), num_workers=dataset_cfg.get('index_num_workers'))
+        selected_indices = self.filterimages(self.label_index, labels, history_labels, overlap)
+        # quick runs use a class-stratified fraction of the images of the task, which is deterministic for a given seed
+        coreset_cfg = dataset_cfg.get('coreset_cfg')
+        if coreset_cfg is not None:
+            coreset_positions = self.label_index.select(selected_indices).coreset(fraction=coreset_cfg['fraction'], seed=coreset_cfg.get('seed', 0))
+            selected_indices = [selected_indices[pos] for pos in coreset_positions]
+        self.subset_label_index = self.label_index.select(selected_indices)
         # remap the labels
         self.labels_to_trainlabels_map = {label: self.all_labels.index(label) for label in self.all_labels}
         self.labels_to_trainlabels_map[255] = 255
+        self.labels_to_trainlabels_lut = self.buildlabelslut(self.labels, self.labels_to_trainlabels_map, masking_value)
         seg_target_transforms = torchvision.transforms.Lambda(
-            lambda t: t.apply_(lambda x: self.labels_to_trainlabels_map[x] if x in self.labels + [255] else masking_value)
+            lambda t: self.remaplabels(t, self.labels_to_trainlabels_lut)
         )
         # obtain subset
-        self.data_generator = Subset(data_generator, selected_indices, transforms, seg_target_transforms)
+        subset_type = IterableSubset if data_generator.streaming else Subset
+        self.data_generator = subset_type(data_generator, selected_indices, transforms, seg_target_transforms)
+    '''movenormalizetodevice'''
+    @staticmethod
+    def movenormalizetodevice(transform_settings, batch_transform_settings=None):
+        transform_settings = [
+            (s['type'], {k: v for k, v in s.items() if k != 'type'}) if isinstance(s, dict) else (s[0], s[1]) for s in copy.deepcopy(transform_settings)
+        ]
+        batch_transform_settings = copy.deepcopy(batch_transform_settings) if batch_transform_settings is not None else []
+        if not transform_settings or transform_settings[-1][0] not in ['Normalize', 'TensorNormalize']:
+            return transform_settings, (batch_transform_settings if batch_transform_settings else None)
+        # workers emit uint8 tensors and the normalization is fused into the batched stage on the training device
+        normalize_type, normalize_cfg = transform_settings.pop(-1)
+        transform_settings = [('ToUint8Tensor', {}) if t == 'ToTensor' else (t, cfg) for t, cfg in transform_settings]
+        batch_transform_settings.append(('BatchNormalize', {
+            'mean': normalize_cfg['mean'], 'std': normalize_cfg['std'], 'scale': normalize_cfg.get('scale', 1.0 / 255.0) if normalize_type == 'TensorNormalize' else 1.0 / 255.0,
+        }))
+        return transform_settings, batch_transform_settings
+    '''buildlabelslut'''
+    @staticmethod
+    def buildlabelslut(labels, labels_to_trainlabels_map, masking_value):
+        lut = np.full((256,), masking_value, dtype=np.uint8)
+        for label in labels + [255]:
+            lut[label] = labels_to_trainlabels_map[label]
+        return torch.from_numpy(lut)
+    '''remaplabels'''
+    @staticmethod
+    def remaplabels(seg_target, lut):
+        if isinstance(seg_target, torch.Tensor):
+            return lut[seg_target.long()]
+        return lut.numpy()[np.asarray(seg_target, dtype=np.uint8)]
     '''gettasklabels'''
     @staticmethod
     def gettasklabels(task_name, tasks, task_id):
@@ -146,25 +467,8 @@ class BaseDataset(torch.utils.data.Dataset):
         return num_classes_per_task
     '''filterimages'''
     @staticmethod
-    def filterimages(dataset, labels, history_labels=None, overlap=True):
-        selected_indices = []
-        if 0 in labels: labels.remove(0)
-        if history_labels is None: history_labels = []
-        all_labels = labels + history_labels + [0, 255]
-        if overlap:
-            filter_func = lambda c: any(x in labels for x in cls)
-        else:
-            filter_func = lambda c: any(x in labels for x in cls) and all(x in all_labels for x in c)
-        if torch.distributed.get_rank() == 0:
-            pbar = tqdm(dataset)
-            pbar.set_description('Filtering Images')
-        else:
-            pbar = dataset
-        for idx, data_meta in enumerate(pbar):
-            cls = np.unique(np.array(data_meta['seg_target']))
-            if filter_func(cls):
-                selected_indices.append(idx)
-        return selected_indices
+    def filterimages(label_index, labels, history_labels=None, overlap=True):
+        return label_index.filter(labels=labels, history_labels=history_labels, overlap=overlap)
     '''stripzero'''
     @staticmethod
     def stripzero(labels):
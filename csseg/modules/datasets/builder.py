@@ -1,6 +1,6 @@
 '''
 Function:
-    Implementation of DatasetBuilder and BuildDataset
+    Implementation of DatasetBuilder, BuildDataset and BuildDataGenerator
 Author:
     Zhenchao Jin
 '''
@@ -17,15 +17,30 @@ class DatasetBuilder(BaseModuleBuilder):
     }
     '''build'''
     def build(self, mode, task_name, task_id, dataset_cfg):
-        dataset_cfg = copy.deepcopy(dataset_cfg)
-        train_cfg, test_cfg = dataset_cfg.pop('train'), dataset_cfg.pop('test')
-        dataset_cfg.update(train_cfg if mode == 'TRAIN' else test_cfg)
+        dataset_cfg = self.mergecfg(mode, dataset_cfg)
         dataset_type = dataset_cfg.pop('type')
         module_cfg = {
             'mode': mode, 'task_name': task_name, 'task_id': task_id, 'dataset_cfg': dataset_cfg, 'type': dataset_type
         }
         return super().build(module_cfg)
+    '''builddatagenerator'''
+    def builddatagenerator(self, mode, dataset_cfg):
+        dataset_cfg = self.mergecfg(mode, dataset_cfg)
+        dataset_type = dataset_cfg.pop('type')
+        dataset_cfg.pop('transforms')
+        return self.REGISTERED_MODULES[dataset_type].builddatagenerator(mode, dataset_cfg)
+    '''mergecfg'''
+    @staticmethod
+    def mergecfg(mode, dataset_cfg):
+        dataset_cfg = copy.deepcopy(dataset_cfg)
+        train_cfg, test_cfg = dataset_cfg.pop('train'), dataset_cfg.pop('test')
+        dataset_cfg.update(train_cfg if mode == 'TRAIN' else test_cfg)
+        return dataset_cfg
 
 
 '''BuildDataset'''
-BuildDataset = DatasetBuilder().build
\ No newline at end of file
+BuildDataset = DatasetBuilder().build
+
+
+'''BuildDataGenerator'''
+BuildDataGenerator = DatasetBuilder().builddatagenerator
\ No newline at end of file
@@ -0,0 +1,2 @@
+'''initialize'''
+from .builder import BuildImageDecoder, ImageDecoderBuilder
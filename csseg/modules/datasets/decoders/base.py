@@ -0,0 +1,60 @@
+'''
+Function:
+    Implementation of BaseImageDecoder
+Author:
+    Zhenchao Jin
+'''
+import io
+
+
+'''BufferReader'''
+class BufferReader(io.RawIOBase):
+    def __init__(self, buffer):
+        # a read-only file over a bytes-like object, e.g., a slice of a memory-mapped shard, which is never copied as a whole
+        self.buffer = memoryview(buffer).cast('B')
+        self.position = 0
+    '''readable'''
+    def readable(self):
+        return True
+    '''seekable'''
+    def seekable(self):
+        return True
+    '''readinto'''
+    def readinto(self, output):
+        num_bytes = max(0, min(len(output), len(self.buffer) - self.position))
+        output[:num_bytes] = self.buffer[self.position: self.position + num_bytes]
+        self.position += num_bytes
+        return num_bytes
+    '''seek'''
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.position = max(0, {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.buffer)}[whence] + offset)
+        return self.position
+    '''tell'''
+    def tell(self):
+        return self.position
+
+
+'''BaseImageDecoder'''
+class BaseImageDecoder():
+    def __init__(self):
+        pass
+    '''call'''
+    def __call__(self, source, mindecodesize=None, shape=None):
+        raise NotImplementedError('not to be implemented')
+    '''getdraftscale'''
+    @staticmethod
+    def getdraftscale(image_size, min_size):
+        # the largest power-of-two reduction of the dct which keeps both sides at least min_size, the same as PIL.Image.draft
+        scale = min(image_size[0] // max(min_size[0], 1), image_size[1] // max(min_size[1], 1))
+        for candidate in [8, 4, 2]:
+            if scale >= candidate: return candidate
+        return 1
+    '''readbytes'''
+    @staticmethod
+    def readbytes(source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return source
+        if isinstance(source, io.BytesIO):
+            return source.getbuffer()
+        with open(source, 'rb') as fp:
+            return fp.read()
@@ -0,0 +1,26 @@
+'''
+Function:
+    Implementation of ImageDecoderBuilder and BuildImageDecoder
+Author:
+    Zhenchao Jin
+'''
+from .pil import PILImageDecoder
+from .raw import RawImageDecoder
+from .opencv import OpenCVImageDecoder
+from ...utils import BaseModuleBuilder
+from .torchvisionio import TorchvisionImageDecoder
+
+
+'''ImageDecoderBuilder'''
+class ImageDecoderBuilder(BaseModuleBuilder):
+    REGISTERED_MODULES = {
+        'PILImageDecoder': PILImageDecoder, 'OpenCVImageDecoder': OpenCVImageDecoder, 'TorchvisionImageDecoder': TorchvisionImageDecoder,
+        'RawImageDecoder': RawImageDecoder,
+    }
+    '''build'''
+    def build(self, decoder_cfg):
+        return super().build(decoder_cfg)
+
+
+'''BuildImageDecoder'''
+BuildImageDecoder = ImageDecoderBuilder().build
@@ -0,0 +1,32 @@
+'''
+Function:
+    Implementation of OpenCVImageDecoder
+Author:
+    Zhenchao Jin
+'''
+import cv2
+import numpy as np
+from PIL import Image
+from .base import BaseImageDecoder, BufferReader
+
+
+'''OpenCVImageDecoder'''
+class OpenCVImageDecoder(BaseImageDecoder):
+    reduced_flags = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+    def __init__(self, num_threads=0):
+        super(OpenCVImageDecoder, self).__init__()
+        # dataloader workers already decode in parallel, so opencv should not start its own threads
+        cv2.setNumThreads(num_threads)
+    '''call'''
+    def __call__(self, source, mindecodesize=None, shape=None):
+        data, flags = self.readbytes(source), cv2.IMREAD_COLOR
+        # jpegs are decoded at the smallest power-of-two reduction which still covers mindecodesize(width, height), the same as PILImageDecoder
+        if mindecodesize is not None and bytes(data[:2]) == b'\xff\xd8':
+            image_size = Image.open(BufferReader(data)).size
+            min_size = mindecodesize(*image_size)
+            scale = self.getdraftscale(image_size, min_size) if min_size is not None else 1
+            if scale > 1: flags = self.reduced_flags[scale]
+        # exif orientation is ignored, the same as PIL.Image.open
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        assert image is not None, 'opencv fails to decode the image'
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
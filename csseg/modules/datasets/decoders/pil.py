@@ -0,0 +1,22 @@
+'''
+Function:
+    Implementation of PILImageDecoder
+Author:
+    Zhenchao Jin
+'''
+from PIL import Image
+from .base import BaseImageDecoder, BufferReader
+
+
+'''PILImageDecoder'''
+class PILImageDecoder(BaseImageDecoder):
+    def __init__(self):
+        super(PILImageDecoder, self).__init__()
+    '''call'''
+    def __call__(self, source, mindecodesize=None, shape=None):
+        image = Image.open(BufferReader(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        # jpegs are decoded at the smallest power-of-two reduction which still covers mindecodesize(width, height)
+        if mindecodesize is not None and image.format == 'JPEG':
+            min_size = mindecodesize(*image.size)
+            if min_size is not None: image.draft('RGB', min_size)
+        return image.convert('RGB')
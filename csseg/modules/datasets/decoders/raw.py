@@ -0,0 +1,21 @@
+'''
+Function:
+    Implementation of RawImageDecoder
+Author:
+    Zhenchao Jin
+'''
+import numpy as np
+from PIL import Image
+from .base import BaseImageDecoder
+
+
+'''RawImageDecoder'''
+class RawImageDecoder(BaseImageDecoder):
+    def __init__(self):
+        super(RawImageDecoder, self).__init__()
+    '''call'''
+    def __call__(self, source, mindecodesize=None, shape=None):
+        # raw uint8 pixels, e.g., packed shards with image_format='raw', only need to be wrapped
+        assert shape is not None, 'raw images can only be decoded with a known shape'
+        image = np.frombuffer(self.readbytes(source), dtype=np.uint8, count=int(np.prod(shape))).reshape(shape)
+        return Image.fromarray(image)
@@ -0,0 +1,23 @@
+'''
+Function:
+    Implementation of TorchvisionImageDecoder
+Author:
+    Zhenchao Jin
+'''
+import torch
+import numpy as np
+import torchvision
+from PIL import Image
+from .base import BaseImageDecoder
+
+
+'''TorchvisionImageDecoder'''
+class TorchvisionImageDecoder(BaseImageDecoder):
+    def __init__(self):
+        super(TorchvisionImageDecoder, self).__init__()
+    '''call'''
+    def __call__(self, source, mindecodesize=None, shape=None):
+        # torchvision has no reduced-resolution decoding, so mindecodesize is ignored and images are always decoded at full resolution
+        data = torch.from_numpy(np.frombuffer(self.readbytes(source), dtype=np.uint8).copy())
+        image = torchvision.io.decode_image(data, mode=torchvision.io.ImageReadMode.RGB)
+        return Image.fromarray(image.permute(1, 2, 0).numpy())
@@ -0,0 +1,191 @@
+'''
+Function:
+    Implementation of SharedImageCache
+Author:
+    Zhenchao Jin
+'''
+import os
+import fcntl
+import atexit
+import hashlib
+import tempfile
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+'''SharedImageCache'''
+class SharedImageCache():
+    header_dtype = np.dtype([
+        ('hits', np.int64), ('misses', np.int64), ('evictions', np.int64), ('used_bytes', np.int64), ('clock', np.int64), ('next_serial', np.int64),
+    ])
+    slot_dtype = np.dtype([
+        ('key', np.uint64), ('serial', np.int64), ('last_access', np.int64), ('nbytes', np.int64), ('height', np.int32), ('width', np.int32), ('has_seg_target', np.int8),
+    ])
+    def __init__(self, name, max_bytes, max_entries=65536):
+        # assert
+        assert max_bytes > 0 and max_entries > 0
+        # set attributes
+        self.name = name
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self.lockpath = os.path.join('/dev/shm' if os.access('/dev/shm', os.W_OK) else tempfile.gettempdir(), f'{name}.lock')
+        self.pid, self.lockfp, self.thread_lock = None, None, threading.Lock()
+        self.meta_shm, self.header, self.slots = None, None, None
+        # the process which creates the metadata removes all segments at exit
+        if self.attach(create=True):
+            atexit.register(self.destroy, os.getpid())
+    '''getname'''
+    @staticmethod
+    def getname(signature):
+        # ranks of the same job on one host agree on the name, different jobs do not
+        signature = ':'.join([str(os.getuid()), os.environ.get('MASTER_ADDR', ''), os.environ.get('MASTER_PORT', ''), signature])
+        return f'csseg_{hashlib.md5(signature.encode("utf-8")).hexdigest()[:12]}'
+    '''getkey'''
+    @staticmethod
+    def getkey(imageid):
+        return np.uint64(int.from_bytes(hashlib.blake2b(str(imageid).encode('utf-8'), digest_size=8).digest(), 'little'))
+    '''opensegment'''
+    @staticmethod
+    def opensegment(name, create=False, size=0):
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        # segments outlive the process which opened them, so they must not be cleaned by its resource tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+    '''unlinksegment'''
+    @staticmethod
+    def unlinksegment(name):
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    '''attach'''
+    def attach(self, create=False):
+        if self.meta_shm is not None:
+            return False
+        meta_nbytes = self.header_dtype.itemsize + self.slot_dtype.itemsize * self.max_entries
+        created = False
+        with self.lock():
+            try:
+                self.meta_shm = self.opensegment(f'{self.name}_meta', create=True, size=meta_nbytes) if create else None
+                created = create
+            except FileExistsError:
+                pass
+            if self.meta_shm is None:
+                self.meta_shm = self.opensegment(f'{self.name}_meta')
+        self.header = np.ndarray((), dtype=self.header_dtype, buffer=self.meta_shm.buf)
+        self.slots = np.ndarray((self.max_entries,), dtype=self.slot_dtype, buffer=self.meta_shm.buf, offset=self.header_dtype.itemsize)
+        return created
+    '''lock'''
+    def lock(self):
+        # flock is shared by forked processes through the inherited descriptor, so every process reopens the lock file
+        if self.pid != os.getpid():
+            self.pid, self.lockfp, self.thread_lock = os.getpid(), open(self.lockpath, 'a+'), threading.Lock()
+        return _FileLock(self.lockfp, self.thread_lock)
+    '''get'''
+    def get(self, imageid):
+        try:
+            self.attach()
+            key = self.getkey(imageid)
+            with self.lock():
+                indices = np.nonzero((self.slots['key'] == key) & (self.slots['serial'] > 0))[0]
+                if len(indices) == 0:
+                    self.header['misses'] += 1
+                    return None
+                index = indices[0]
+                self.header['hits'] += 1
+                self.header['clock'] += 1
+                self.slots['last_access'][index] = self.header['clock']
+                height, width, has_seg_target = int(self.slots['height'][index]), int(self.slots['width'][index]), bool(self.slots['has_seg_target'][index])
+                shm = self.opensegment(f'{self.name}_{int(self.slots["serial"][index])}')
+            # an entry evicted from now on is only unlinked, so the mapping stays valid while copying
+            image = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf).copy()
+            seg_target = np.ndarray((height, width), dtype=np.uint8, buffer=shm.buf, offset=image.nbytes).copy() if has_seg_target else None
+            shm.close()
+            return image, seg_target
+        except (FileNotFoundError, OSError):
+            return None
+    '''put'''
+    def put(self, imageid, image, seg_target=None):
+        assert image.dtype == np.uint8 and image.ndim == 3 and image.shape[2] == 3
+        nbytes = image.nbytes + (seg_target.nbytes if seg_target is not None else 0)
+        if nbytes > self.max_bytes: return False
+        try:
+            self.attach()
+            key = self.getkey(imageid)
+            with self.lock():
+                if ((self.slots['key'] == key) & (self.slots['serial'] > 0)).any():
+                    return True
+                self.evict(nbytes)
+                index = int(np.nonzero(self.slots['serial'] <= 0)[0][0])
+                self.header['next_serial'] += 1
+                serial = int(self.header['next_serial'])
+                shm = self.opensegment(f'{self.name}_{serial}', create=True, size=nbytes)
+                shm.buf[:image.nbytes] = image.tobytes()
+                if seg_target is not None:
+                    shm.buf[image.nbytes: nbytes] = np.ascontiguousarray(seg_target, dtype=np.uint8).tobytes()
+                shm.close()
+                self.header['clock'] += 1
+                self.header['used_bytes'] += nbytes
+                self.slots[index] = (key, serial, self.header['clock'], nbytes, image.shape[0], image.shape[1], seg_target is not None)
+            return True
+        except (FileNotFoundError, OSError):
+            return False
+    '''evict'''
+    def evict(self, nbytes):
+        # drop the least recently used entries until the new one fits, the caller holds the lock
+        valid = self.slots['serial'] > 0
+        order = np.argsort(np.where(valid, self.slots['last_access'], np.iinfo(np.int64).max), kind='stable')
+        for index in order:
+            if self.header['used_bytes'] + nbytes <= self.max_bytes and valid.sum() < self.max_entries: break
+            if not valid[index]: break
+            self.unlinksegment(f'{self.name}_{int(self.slots["serial"][index])}')
+            self.header['used_bytes'] -= self.slots['nbytes'][index]
+            self.header['evictions'] += 1
+            self.slots['serial'][index], valid[index] = 0, False
+    '''stats'''
+    def stats(self):
+        self.attach()
+        return {
+            'hits': int(self.header['hits']), 'misses': int(self.header['misses']), 'evictions': int(self.header['evictions']),
+            'used_bytes': int(self.header['used_bytes']), 'num_entries': int((self.slots['serial'] > 0).sum()),
+        }
+    '''destroy'''
+    def destroy(self, owner_pid=None):
+        if owner_pid is not None and owner_pid != os.getpid(): return
+        try:
+            self.attach()
+            with self.lock():
+                for serial in self.slots['serial'][self.slots['serial'] > 0]:
+                    self.unlinksegment(f'{self.name}_{int(serial)}')
+                self.slots['serial'] = 0
+            self.header, self.slots = None, None
+            self.meta_shm.close()
+            self.unlinksegment(f'{self.name}_meta')
+            self.meta_shm = None
+            os.remove(self.lockpath)
+        except (FileNotFoundError, OSError):
+            pass
+    '''getstate'''
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update({'pid': None, 'lockfp': None, 'thread_lock': None, 'meta_shm': None, 'header': None, 'slots': None})
+        return state
+
+
+'''_FileLock'''
+class _FileLock():
+    def __init__(self, fp, thread_lock):
+        self.fp = fp
+        self.thread_lock = thread_lock
+    '''enter'''
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.flock(self.fp.fileno(), fcntl.LOCK_EX)
+        return self
+    '''exit'''
+    def __exit__(self, exc_type, exc_value, traceback):
+        fcntl.flock(self.fp.fileno(), fcntl.LOCK_UN)
+        self.thread_lock.release()
@@ -0,0 +1,176 @@
+'''
+Function:
+    Implementation of LabelIndex
+Author:
+    Zhenchao Jin
+'''
+import os
+import hashlib
+import multiprocessing
+import numpy as np
+import torch.distributed as dist
+from PIL import Image
+from tqdm import tqdm
+
+
+'''LabelIndex'''
+class LabelIndex():
+    num_label_values = 256
+    def __init__(self, imageids, label_counts):
+        # assert
+        assert len(imageids) == label_counts.shape[0]
+        assert label_counts.shape[1] == self.num_label_values
+        # set attributes
+        self.imageids = list(imageids)
+        self.label_counts = label_counts
+        # problems met with the cache file while building, they are logged by the caller on rank 0
+        self.messages = []
+    '''presence'''
+    @property
+    def presence(self):
+        return self.label_counts > 0
+    '''filter'''
+    def filter(self, labels, history_labels=None, overlap=True):
+        labels = [l for l in labels if l != 0]
+        history_labels = history_labels if history_labels is not None else []
+        presence = self.presence
+        selected = presence[:, labels].any(axis=1)
+        if not overlap:
+            allowed = np.zeros(self.num_label_values, dtype=bool)
+            allowed[labels + history_labels + [0, 255]] = True
+            selected = selected & (~presence[:, ~allowed].any(axis=1))
+        return np.nonzero(selected)[0].tolist()
+    '''invert'''
+    def invert(self, labels=None):
+        # label -> (positions of the images containing it, number of its pixels in each of them)
+        labels = range(self.num_label_values) if labels is None else labels
+        inverted_index = {}
+        for label in labels:
+            indices = np.nonzero(self.label_counts[:, label])[0]
+            if len(indices) > 0:
+                inverted_index[label] = (indices, self.label_counts[indices, label])
+        return inverted_index
+    '''coreset'''
+    def coreset(self, fraction, seed=0):
+        assert 0 < fraction <= 1
+        rng = np.random.default_rng(seed)
+        presence = self.presence.copy()
+        presence[:, [0, 255]] = False
+        # every image is stratified by its rarest class, and each stratum is sampled with the same fraction
+        frequencies = presence.sum(axis=0)
+        rarities = np.where(presence, frequencies[None, :], np.iinfo(np.int64).max)
+        strata = np.where(presence.any(axis=1), rarities.argmin(axis=1), 0)
+        selected = np.zeros((len(self.imageids),), dtype=bool)
+        for stratum in np.unique(strata):
+            indices = np.nonzero(strata == stratum)[0]
+            selected[rng.choice(indices, size=max(1, int(round(fraction * len(indices)))), replace=False)] = True
+        # classes which are never the rarest of an image may still be missed, one of their images is then added
+        for label in np.nonzero(frequencies)[0]:
+            if not presence[selected, label].any():
+                selected[rng.choice(np.nonzero(presence[:, label])[0])] = True
+        return np.nonzero(selected)[0].tolist()
+    '''select'''
+    def select(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        return LabelIndex(imageids=[self.imageids[idx] for idx in indices], label_counts=self.label_counts[indices])
+    '''countlabels'''
+    @staticmethod
+    def countlabels(annpath):
+        if not os.path.exists(annpath):
+            return np.zeros((LabelIndex.num_label_values,), dtype=np.int32)
+        seg_target = np.array(Image.open(annpath), dtype=np.uint8)
+        return np.bincount(seg_target.ravel(), minlength=LabelIndex.num_label_values).astype(np.int32)
+    '''getmtimes'''
+    @staticmethod
+    def getmtimes(annpaths):
+        mtimes = np.full((len(annpaths),), -1, dtype=np.int64)
+        for idx, annpath in enumerate(annpaths):
+            if os.path.exists(annpath):
+                mtimes[idx] = os.stat(annpath).st_mtime_ns
+        return mtimes
+    '''getcachepath'''
+    @staticmethod
+    def getcachepath(cache_dir, ann_dir, imageids):
+        signature = hashlib.md5('\n'.join([os.path.abspath(ann_dir)] + list(imageids)).encode('utf-8')).hexdigest()
+        return os.path.join(cache_dir, f'labelindex_{signature[:16]}.npz')
+    '''load'''
+    @staticmethod
+    def load(cachepath):
+        if not os.path.exists(cachepath):
+            return None, None, None
+        try:
+            cache = np.load(cachepath, allow_pickle=False)
+            return cache['mtimes'], cache['label_counts'], None
+        except (OSError, KeyError, ValueError) as err:
+            return None, None, f'Label index cache {cachepath} is unreadable ({err}), it is rebuilt'
+    '''save'''
+    @staticmethod
+    def save(cachepath, mtimes, label_counts):
+        try:
+            os.makedirs(os.path.dirname(cachepath), exist_ok=True)
+            tmppath = f'{cachepath}.{os.getpid()}.tmp.npz'
+            np.savez(tmppath, mtimes=mtimes, label_counts=label_counts)
+            os.replace(tmppath, cachepath)
+            return None
+        except (OSError, ValueError) as err:
+            return f'Label index cache {cachepath} can not be saved ({err})'
+    '''countlabelsparallel'''
+    @staticmethod
+    def countlabelsparallel(annpaths, num_workers=1, verbose=False):
+        if len(annpaths) == 0:
+            return np.zeros((0, LabelIndex.num_label_values), dtype=np.int32)
+        if num_workers > 1 and len(annpaths) > 1:
+            pool = multiprocessing.Pool(processes=min(num_workers, len(annpaths)))
+            results = pool.imap(LabelIndex.countlabels, annpaths, chunksize=max(1, min(64, len(annpaths) // (num_workers * 4))))
+        else:
+            pool, results = None, map(LabelIndex.countlabels, annpaths)
+        if verbose:
+            results = tqdm(results, total=len(annpaths))
+            results.set_description('Indexing Labels')
+        label_counts = np.stack(list(results))
+        if pool is not None:
+            pool.close()
+            pool.join()
+        return label_counts
+    '''build'''
+    @classmethod
+    def build(cls, data_generator, cache_dir=None, num_workers=None):
+        imageids = list(data_generator.imageids)
+        annpaths = [data_generator.getannpath(imageid) for imageid in imageids]
+        cache_dir = cache_dir if cache_dir is not None else os.path.join(data_generator.dataset_cfg['rootdir'], '.cache')
+        cachepath = cls.getcachepath(cache_dir, data_generator.ann_dir, imageids)
+        num_workers = num_workers if num_workers is not None else min(8, os.cpu_count() or 1)
+        is_distributed = dist.is_available() and dist.is_initialized()
+        rank = dist.get_rank() if is_distributed else 0
+        world_size = dist.get_world_size() if is_distributed else 1
+        # rank 0 finds the annotations whose cached counts are missing or out of date
+        mtimes, label_counts, stale_indices, messages = None, None, None, []
+        if rank == 0:
+            mtimes = cls.getmtimes(annpaths)
+            cached_mtimes, label_counts, message = cls.load(cachepath)
+            if message is not None: messages.append(message)
+            if cached_mtimes is None or cached_mtimes.shape != mtimes.shape:
+                cached_mtimes = np.full_like(mtimes, -2)
+                label_counts = np.zeros((len(imageids), cls.num_label_values), dtype=np.int32)
+            stale_indices = np.nonzero(cached_mtimes != mtimes)[0]
+        # the other ranks receive the cached counts of rank 0 and never read the cache file themselves
+        if is_distributed:
+            objects = [stale_indices, label_counts]
+            dist.broadcast_object_list(objects, src=0)
+            stale_indices, label_counts = objects
+        # every rank counts its own shard of the stale annotations with a local process pool
+        if len(stale_indices) > 0:
+            shard_indices = stale_indices[rank::world_size]
+            shard_label_counts = cls.countlabelsparallel([annpaths[idx] for idx in shard_indices], num_workers=num_workers, verbose=(rank == 0))
+            gathered = [(shard_indices, shard_label_counts)]
+            if is_distributed:
+                gathered = [None for _ in range(world_size)]
+                dist.all_gather_object(gathered, (shard_indices, shard_label_counts))
+            for indices, counts in gathered:
+                if len(indices) > 0: label_counts[indices] = counts
+            if rank == 0:
+                message = cls.save(cachepath, mtimes, label_counts)
+                if message is not None: messages.append(message)
+        label_index = cls(imageids=imageids, label_counts=label_counts)
+        label_index.messages = messages
+        return label_index
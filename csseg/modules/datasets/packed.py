@@ -0,0 +1,127 @@
+'''
+Function:
+    Implementation of _PackedDataset
+Author:
+    Zhenchao Jin
+'''
+import os
+import mmap
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+from .base import _BaseDataset
+from .labelindex import LabelIndex
+from .decoders import BuildImageDecoder
+
+
+'''_PackedDataset'''
+class _PackedDataset(_BaseDataset):
+    file_based = False
+    def __init__(self, mode, dataset_cfg, source_data_generator):
+        super(_PackedDataset, self).__init__(mode=mode, dataset_cfg=dataset_cfg)
+        # set attributes
+        packed_cfg = dataset_cfg['packed_cfg']
+        self.num_classes = source_data_generator.num_classes
+        self.classnames = source_data_generator.classnames
+        self.image_dir, self.ann_dir = source_data_generator.image_dir, source_data_generator.ann_dir
+        self.imageids = list(source_data_generator.imageids)
+        self.packed_dir = packed_cfg['packed_dir']
+        self.prefix = packed_cfg.get('prefix', dataset_cfg['set'])
+        # load packed index
+        packed_index = np.load(self.getindexpath(self.packed_dir, self.prefix), allow_pickle=False)
+        self.image_format = str(packed_index['image_format'])
+        self.num_shards = int(packed_index['num_shards'])
+        if self.image_format == 'raw': self.image_decoder = BuildImageDecoder({'type': 'RawImageDecoder'})
+        positions = {str(imageid): idx for idx, imageid in enumerate(packed_index['imageids'])}
+        assert all(imageid in positions for imageid in self.imageids), f'{self.packed_dir} does not contain all images of set {self.prefix}'
+        positions = np.array([positions[imageid] for imageid in self.imageids], dtype=np.int64)
+        self.records = packed_index['records'][positions]
+        self.label_counts = packed_index['label_counts'][positions]
+        self.shards = {}
+    '''read'''
+    def read(self, index):
+        record = self.records[index]
+        shard = self.getshard(int(record['shard']))
+        height, width = int(record['height']), int(record['width'])
+        # image
+        if self.image_format == 'raw':
+            image = self.image_decoder(memoryview(shard)[int(record['image_offset']):], shape=(height, width, 3))
+        else:
+            # the decoder reads the encoded bytes from the memory-mapped shard without copying them
+            image = memoryview(shard)[int(record['image_offset']): int(record['image_offset']) + int(record['image_nbytes'])]
+            image = self.openimage(image)
+        # seg_target
+        seg_target = None
+        if self.mode == 'TRAIN': assert record['ann_offset'] >= 0
+        if record['ann_offset'] >= 0:
+            seg_target = np.frombuffer(shard, dtype=np.uint8, count=height * width, offset=int(record['ann_offset'])).reshape(height, width)
+            seg_target = Image.fromarray(seg_target)
+        # return
+        return image, seg_target
+    '''getshard'''
+    def getshard(self, shard_id):
+        if shard_id not in self.shards:
+            with open(self.getshardpath(self.packed_dir, self.prefix, shard_id), 'rb') as fp:
+                self.shards[shard_id] = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.shards[shard_id]
+    '''buildlabelindex'''
+    def buildlabelindex(self, cache_dir=None, num_workers=None):
+        return LabelIndex(imageids=self.imageids, label_counts=self.label_counts)
+    '''getstate'''
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['shards'] = {}
+        return state
+    '''getindexpath'''
+    @staticmethod
+    def getindexpath(packed_dir, prefix):
+        return os.path.join(packed_dir, f'{prefix}.index.npz')
+    '''getshardpath'''
+    @staticmethod
+    def getshardpath(packed_dir, prefix, shard_id):
+        return os.path.join(packed_dir, f'{prefix}.{shard_id:05d}.bin')
+    '''pack'''
+    @staticmethod
+    def pack(data_generator, packed_dir, prefix, shard_size=1024**3, image_format='encoded'):
+        assert image_format in ['encoded', 'raw']
+        os.makedirs(packed_dir, exist_ok=True)
+        records = np.zeros((len(data_generator.imageids),), dtype=[
+            ('shard', np.int32), ('image_offset', np.int64), ('image_nbytes', np.int64), ('ann_offset', np.int64), ('height', np.int32), ('width', np.int32),
+        ])
+        label_counts = np.zeros((len(data_generator.imageids), LabelIndex.num_label_values), dtype=np.int32)
+        shard_id, fp = 0, open(_PackedDataset.getshardpath(packed_dir, prefix, 0), 'wb')
+        pbar = tqdm(data_generator.imageids)
+        pbar.set_description('Packing Images')
+        for idx, imageid in enumerate(pbar):
+            imagepath, annpath = data_generator.getimagepath(imageid), data_generator.getannpath(imageid)
+            image = Image.open(imagepath)
+            width, height = image.size
+            if image_format == 'raw':
+                image_bytes = np.asarray(image.convert('RGB'), dtype=np.uint8).tobytes()
+            else:
+                with open(imagepath, 'rb') as image_fp:
+                    image_bytes = image_fp.read()
+            ann_bytes = None
+            if os.path.exists(annpath):
+                seg_target = np.array(Image.open(annpath), dtype=np.uint8)
+                assert seg_target.shape == (height, width)
+                label_counts[idx] = np.bincount(seg_target.ravel(), minlength=LabelIndex.num_label_values)
+                ann_bytes = seg_target.tobytes()
+            # start a new shard once the current one is full
+            if fp.tell() > 0 and fp.tell() + len(image_bytes) + (len(ann_bytes) if ann_bytes else 0) > shard_size:
+                fp.close()
+                shard_id += 1
+                fp = open(_PackedDataset.getshardpath(packed_dir, prefix, shard_id), 'wb')
+            records['shard'][idx], records['height'][idx], records['width'][idx] = shard_id, height, width
+            records['image_offset'][idx], records['image_nbytes'][idx] = fp.tell(), len(image_bytes)
+            fp.write(image_bytes)
+            records['ann_offset'][idx] = -1
+            if ann_bytes is not None:
+                records['ann_offset'][idx] = fp.tell()
+                fp.write(ann_bytes)
+        fp.close()
+        np.savez(
+            _PackedDataset.getindexpath(packed_dir, prefix), imageids=np.array(data_generator.imageids), records=records, label_counts=label_counts,
+            image_format=np.array(image_format), num_shards=np.array(shard_id + 1),
+        )
+        return True
@@ -1,3 +1,4 @@
 '''initialize'''
+from .transforms import Compose
 from .evaluators import SegmentationEvaluator
-from .transforms import DataTransformBuilder, BuildDataTransform, Compose
\ No newline at end of file
+from .builder import DataTransformBuilder, BuildDataTransform, BatchTransformBuilder, BuildBatchTransform
\ No newline at end of file
@@ -0,0 +1,200 @@
+'''
+Function:
+    Implementation of Batch Transforms, which augment collated batches on the training device
+Author:
+    Zhenchao Jin
+'''
+import math
+import torch
+import numbers
+import collections
+import torch.nn.functional as F
+from .tensortransforms import resizeimage, resizesegtarget
+
+
+'''tofloatimage'''
+def tofloatimage(image):
+    return image if image.is_floating_point() else image.to(torch.float32)
+
+
+'''BatchRandomResizedCrop'''
+class BatchRandomResizedCrop(object):
+    def __init__(self, output_size, scale=(0.08, 1.0), ratio=(3. / 4., 4. / 3.), flip_prob=0.0, image_interpolation='bilinear', num_trials=10):
+        # assert
+        assert isinstance(output_size, int) or \
+               (isinstance(output_size, collections.abc.Sequence) and len(output_size) == 2)
+        if isinstance(output_size, int):
+            output_size = (output_size, output_size)
+        assert isinstance(scale, collections.abc.Sequence) and len(scale) == 2
+        assert scale[1] > scale[0]
+        assert isinstance(ratio, collections.abc.Sequence) and len(ratio) == 2
+        assert ratio[1] > ratio[0]
+        assert isinstance(flip_prob, numbers.Number)
+        # set attributes
+        self.output_size = tuple(output_size)
+        self.scale = scale
+        self.ratio = ratio
+        self.flip_prob = flip_prob
+        self.num_trials = num_trials
+        self.image_interpolation = image_interpolation
+    '''call'''
+    def __call__(self, data_meta):
+        image = data_meta['image']
+        batch_size, image_height, image_width = image.shape[0], image.shape[-2], image.shape[-1]
+        top, left, height, width = self.getparams(batch_size, image_height, image_width, self.scale, self.ratio, self.num_trials, image.device)
+        flip = torch.rand(batch_size, device=image.device) < self.flip_prob
+        # the output size scheduled for the batch arrives collated, it is the same for every sample
+        output_size = data_meta.pop('output_size', None)
+        output_size = (int(output_size.view(-1)[0]),) * 2 if output_size is not None else self.output_size
+        if image.device.type == 'cpu':
+            return self.cropresizepersample(data_meta, top.tolist(), left.tolist(), height.tolist(), width.tolist(), flip.tolist(), output_size)
+        # crop, resize and flip are expressed as one affine sampling grid per sample
+        theta = torch.zeros(batch_size, 2, 3, dtype=torch.float32, device=image.device)
+        theta[:, 0, 0] = (width / image_width) * torch.where(flip, -1.0, 1.0)
+        theta[:, 0, 2] = (2 * left + width) / image_width - 1
+        theta[:, 1, 1] = height / image_height
+        theta[:, 1, 2] = (2 * top + height) / image_height - 1
+        grid = F.affine_grid(theta, size=(batch_size, 1, *output_size), align_corners=False)
+        data_meta['image'] = F.grid_sample(tofloatimage(image), grid, mode=self.image_interpolation, padding_mode='border', align_corners=False)
+        if data_meta.get('seg_target') is not None:
+            seg_target = data_meta['seg_target']
+            seg_target = F.grid_sample(seg_target[:, None].to(torch.float32), grid, mode='nearest', padding_mode='border', align_corners=False)[:, 0]
+            data_meta['seg_target'] = seg_target.to(data_meta['seg_target'].dtype)
+        return data_meta
+    '''cropresizepersample'''
+    def cropresizepersample(self, data_meta, top, left, height, width, flip, output_size):
+        # on cpu, the uint8 kernels of interpolate applied to crop views are much cheaper than float grid sampling
+        images, seg_targets = [], []
+        for idx in range(len(top)):
+            t, l, h, w = int(top[idx]), int(left[idx]), int(height[idx]), int(width[idx])
+            image = resizeimage(data_meta['image'][idx, :, t: t + h, l: l + w], output_size, self.image_interpolation)
+            images.append(image.flip(-1) if flip[idx] else image)
+            if data_meta.get('seg_target') is not None:
+                seg_target = resizesegtarget(data_meta['seg_target'][idx, t: t + h, l: l + w], output_size)
+                seg_targets.append(seg_target.flip(-1) if flip[idx] else seg_target)
+        data_meta['image'] = torch.stack(images)
+        if data_meta.get('seg_target') is not None:
+            data_meta['seg_target'] = torch.stack(seg_targets)
+        return data_meta
+    '''getparams'''
+    @staticmethod
+    def getparams(batch_size, image_height, image_width, scale, ratio, num_trials, device):
+        area = image_height * image_width
+        # sample all trials at once and keep the first one that fits, as RandomResizedCrop does per sample
+        output_area = area * torch.empty(batch_size, num_trials, device=device).uniform_(scale[0], scale[1])
+        aspect_ratio = torch.exp(torch.empty(batch_size, num_trials, device=device).uniform_(math.log(ratio[0]), math.log(ratio[1])))
+        width = torch.sqrt(output_area * aspect_ratio).round()
+        height = torch.sqrt(output_area / aspect_ratio).round()
+        valid = (width <= image_width) & (height <= image_height)
+        first = torch.argmax(valid.to(torch.int32), dim=1, keepdim=True)
+        width, height, found = width.gather(1, first)[:, 0], height.gather(1, first)[:, 0], valid.any(dim=1)
+        # fall back to a center crop with the aspect ratio clamped into range
+        in_ratio = image_width / image_height
+        if in_ratio < min(ratio):
+            fallback_width, fallback_height = image_width, int(round(image_width / min(ratio)))
+        elif in_ratio > max(ratio):
+            fallback_width, fallback_height = int(round(image_height * max(ratio))), image_height
+        else:
+            fallback_width, fallback_height = image_width, image_height
+        width = torch.where(found, width, torch.full_like(width, fallback_width))
+        height = torch.where(found, height, torch.full_like(height, fallback_height))
+        top = torch.where(found, torch.floor(torch.rand(batch_size, device=device) * (image_height - height + 1)), (image_height - height) // 2)
+        left = torch.where(found, torch.floor(torch.rand(batch_size, device=device) * (image_width - width + 1)), (image_width - width) // 2)
+        return top, left, height, width
+
+
+'''BatchRandomHorizontalFlip'''
+class BatchRandomHorizontalFlip(object):
+    def __init__(self, prob=0.5):
+        # assert
+        assert isinstance(prob, numbers.Number)
+        # set attributes
+        self.prob = prob
+    '''call'''
+    def __call__(self, data_meta):
+        flip = torch.rand(data_meta['image'].shape[0], device=data_meta['image'].device) < self.prob
+        for key in ['image', 'seg_target']:
+            if data_meta.get(key) is None: continue
+            mask = flip.view(-1, *([1] * (data_meta[key].dim() - 1)))
+            data_meta[key] = torch.where(mask, data_meta[key].flip(-1), data_meta[key])
+        return data_meta
+
+
+'''BatchColorJitter'''
+class BatchColorJitter(object):
+    def __init__(self, brightness=None, contrast=None, saturation=None, hue=None, max_value=255.0):
+        # set attributes after checking
+        self.brightness = self.check(brightness)
+        self.contrast = self.check(contrast)
+        self.saturation = self.check(saturation)
+        self.hue = self.check(hue, center=0, bound=(-0.5, 0.5), clip_first_on_zero=False)
+        self.max_value = max_value
+    '''call'''
+    def __call__(self, data_meta):
+        image = data_meta['image']
+        batch_size, device = image.shape[0], image.device
+        samplefactors = lambda value: torch.empty(batch_size, 1, 1, 1, device=device).uniform_(value[0], value[1])
+        # factors are drawn per sample and applied in a fixed order so that the whole batch is processed at once
+        image = image.to(torch.float32) if not image.is_floating_point() else image
+        if self.brightness is not None:
+            image.mul_(samplefactors(self.brightness)).clamp_(0, self.max_value)
+        if self.contrast is not None:
+            factors = samplefactors(self.contrast)
+            mean = self.grayscale(image).mean(dim=(1, 2, 3), keepdim=True)
+            image.mul_(factors).add_(mean * (1 - factors)).clamp_(0, self.max_value)
+        if self.saturation is not None:
+            factors = samplefactors(self.saturation)
+            image.mul_(factors).add_(self.grayscale(image).mul_(1 - factors)).clamp_(0, self.max_value)
+        if self.hue is not None:
+            image = self.rotatehue(image, samplefactors(self.hue)[:, 0, 0, 0] * 2 * math.pi).clamp_(0, self.max_value)
+        data_meta['image'] = image
+        return data_meta
+    '''grayscale'''
+    @staticmethod
+    def grayscale(image):
+        grayscale = image[:, 0: 1] * 0.2989
+        grayscale.add_(image[:, 1: 2], alpha=0.587).add_(image[:, 2: 3], alpha=0.114)
+        return grayscale
+    '''rotatehue'''
+    @staticmethod
+    def rotatehue(image, angles):
+        # hue shift as a rotation of the chroma plane in YIQ space
+        rgb2yiq = torch.tensor([[0.299, 0.587, 0.114], [0.596, -0.274, -0.322], [0.211, -0.523, 0.312]], dtype=torch.float32, device=image.device)
+        yiq2rgb = torch.linalg.inv(rgb2yiq)
+        cos, sin = torch.cos(angles), torch.sin(angles)
+        rotation = torch.zeros(angles.shape[0], 3, 3, dtype=torch.float32, device=image.device)
+        rotation[:, 0, 0], rotation[:, 1, 1], rotation[:, 1, 2], rotation[:, 2, 1], rotation[:, 2, 2] = 1, cos, -sin, sin, cos
+        matrix = yiq2rgb[None] @ rotation @ rgb2yiq[None]
+        return torch.einsum('bij,bjhw->bihw', matrix, image)
+    '''check'''
+    def check(self, value, center=1, bound=(0, float('inf')), clip_first_on_zero=True):
+        if value is None: return value
+        # assert
+        assert isinstance(value, (numbers.Number, collections.abc.Sequence))
+        if isinstance(value, numbers.Number):
+            assert value >= 0
+            value = [center - value, center + value]
+            if clip_first_on_zero:
+                value[0] = max(value[0], 0)
+        else:
+            assert bound[0] <= value[0] <= value[1] <= bound[1]
+        # set
+        return value
+
+
+'''BatchNormalize'''
+class BatchNormalize(object):
+    def __init__(self, mean, std, scale=1.0 / 255.0):
+        # set attributes
+        self.mean = mean
+        self.std = std
+        self.scale = scale
+        mean, std = torch.tensor(mean, dtype=torch.float32), torch.tensor(std, dtype=torch.float32)
+        self.multiplier = (scale / std).view(1, -1, 1, 1)
+        self.offset = (mean / std).view(1, -1, 1, 1)
+    '''call'''
+    def __call__(self, data_meta):
+        image = data_meta['image']
+        multiplier, offset = self.multiplier.to(image.device), self.offset.to(image.device)
+        data_meta['image'] = tofloatimage(image).mul_(multiplier).sub_(offset)
+        return data_meta
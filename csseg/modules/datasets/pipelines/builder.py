@@ -0,0 +1,53 @@
+'''
+Function:
+    Implementation of DataTransformBuilder, BuildDataTransform, BatchTransformBuilder and BuildBatchTransform
+Author:
+    Zhenchao Jin
+'''
+from ...utils import BaseModuleBuilder
+from .transforms import (
+    Resize, CenterCrop, Pad, Lambda, RandomRotation, RandomHorizontalFlip, RandomVerticalFlip, ToTensor, Normalize, RandomCrop, RandomResizedCrop, ClassAwareRandomResizedCrop,
+    ColorJitter
+)
+from .batchtransforms import (
+    BatchRandomResizedCrop, BatchRandomHorizontalFlip, BatchColorJitter, BatchNormalize
+)
+from .tensortransforms import (
+    ToUint8Tensor, TensorResize, TensorCenterCrop, TensorPad, TensorRandomHorizontalFlip, TensorRandomCrop, TensorRandomResizedCrop, TensorNormalize
+)
+
+
+'''DataTransformBuilder'''
+class DataTransformBuilder(BaseModuleBuilder):
+    REGISTERED_MODULES = {
+        'Resize': Resize, 'CenterCrop': CenterCrop, 'Pad': Pad, 'Lambda': Lambda, 'RandomRotation': RandomRotation, 
+        'RandomHorizontalFlip': RandomHorizontalFlip, 'RandomVerticalFlip': RandomVerticalFlip, 'ToTensor': ToTensor,
+        'Normalize': Normalize, 'RandomCrop': RandomCrop, 'RandomResizedCrop': RandomResizedCrop, 'ClassAwareRandomResizedCrop': ClassAwareRandomResizedCrop,
+        'ColorJitter': ColorJitter,
+        'ToUint8Tensor': ToUint8Tensor, 'TensorResize': TensorResize, 'TensorCenterCrop': TensorCenterCrop, 'TensorPad': TensorPad, 
+        'TensorRandomHorizontalFlip': TensorRandomHorizontalFlip, 'TensorRandomCrop': TensorRandomCrop, 'TensorRandomResizedCrop': TensorRandomResizedCrop,
+        'TensorNormalize': TensorNormalize,
+    }
+    '''build'''
+    def build(self, transform_cfg):
+        return super().build(transform_cfg)
+
+
+'''BuildDataTransform'''
+BuildDataTransform = DataTransformBuilder().build
+
+
+
+'''BatchTransformBuilder'''
+class BatchTransformBuilder(BaseModuleBuilder):
+    REGISTERED_MODULES = {
+        'BatchRandomResizedCrop': BatchRandomResizedCrop, 'BatchRandomHorizontalFlip': BatchRandomHorizontalFlip, 'BatchColorJitter': BatchColorJitter,
+        'BatchNormalize': BatchNormalize,
+    }
+    '''build'''
+    def build(self, transform_cfg):
+        return super().build(transform_cfg)
+
+
+'''BuildBatchTransform'''
+BuildBatchTransform = BatchTransformBuilder().build
\ No newline at end of file
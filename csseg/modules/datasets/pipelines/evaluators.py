@@ -17,33 +17,40 @@ class SegmentationEvaluator():
         self.reset()
     '''reset'''
     def reset(self):
-        self.confusion_matrix = np.zeros((self.num_classes, self.num_classes))
+        # the confusion matrix is created on the device of the first predictions
+        self.confusion_matrix = None
         self.total_samples = 0
     '''synchronize'''
-    def synchronize(self, device=None):
-        confusion_matrix = torch.tensor(self.confusion_matrix).to(device)
-        total_samples = torch.tensor(self.total_samples).to(device)
-        dist.reduce(confusion_matrix, dst=0)
-        dist.reduce(total_samples, dst=0)
-        self.confusion_matrix = confusion_matrix.cpu().numpy()
-        self.total_samples = total_samples.cpu().numpy()
+    def synchronize(self, device=None, group=None):
+        if self.confusion_matrix is None:
+            self.confusion_matrix = torch.zeros((self.num_classes, self.num_classes), dtype=torch.int64, device=device)
+        if device is not None:
+            self.confusion_matrix = self.confusion_matrix.to(device)
+        if not (dist.is_available() and dist.is_initialized()): return
+        # the number of samples is reduced together with the confusion matrix in a single call
+        packed = torch.cat([self.confusion_matrix.flatten(), torch.tensor([self.total_samples], dtype=torch.int64, device=self.confusion_matrix.device)])
+        dist.all_reduce(packed, group=group)
+        self.confusion_matrix = packed[:-1].view(self.num_classes, self.num_classes)
+        self.total_samples = int(packed[-1])
     '''update'''
     def update(self, seg_targets, seg_preds):
-        for st, sp in zip(seg_targets, seg_preds):
-            self.confusion_matrix += self.fasthist(st.flatten(), sp.flatten())
+        seg_targets, seg_preds = torch.as_tensor(seg_targets), torch.as_tensor(seg_preds)
+        hist = self.fasthist(seg_targets.flatten(), seg_preds.to(seg_targets.device).flatten())
+        self.confusion_matrix = hist if self.confusion_matrix is None else self.confusion_matrix + hist.to(self.confusion_matrix.device)
         self.total_samples += len(seg_targets)
     '''fasthist'''
     def fasthist(self, seg_target, seg_pred):
+        # one bincount over all pixels of the batch, on the device where the predictions are
         mask = (seg_target >= 0) & (seg_target < self.num_classes)
-        hist = np.bincount(
-            self.num_classes * seg_target[mask].astype(int) + seg_pred[mask], minlength=self.num_classes**2
-        ).reshape(self.num_classes, self.num_classes)
+        hist = torch.bincount(
+            self.num_classes * seg_target[mask].long() + seg_pred[mask].long(), minlength=self.num_classes**2
+        ).view(self.num_classes, self.num_classes)
         return hist
     '''evaluate'''
     def evaluate(self):
         # obtain variables
         eps = self.eps
-        hist = self.confusion_matrix
+        hist = self.confusion_matrix.cpu().numpy().astype(np.float64)
         # evaluate
         all_accuracy = np.diag(hist).sum() / hist.sum()
         mean_accuracy = np.mean((np.diag(hist) / (hist.sum(axis=1) + eps))[hist.sum(axis=1) != 0])
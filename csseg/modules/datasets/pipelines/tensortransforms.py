@@ -0,0 +1,212 @@
+'''
+Function:
+    Implementation of Tensor Transforms, which process uint8 tensors instead of PIL images
+Author:
+    Zhenchao Jin
+'''
+import torch
+import random
+import numbers
+import numpy as np
+import collections
+import torch.nn.functional as NF
+import torchvision.transforms.functional as F
+from .transforms import RandomResizedCrop
+
+
+'''resizeimage'''
+def resizeimage(image, output_size, interpolation='bilinear', antialias=True):
+    # uint8 channels-last inputs take the vectorized uint8 kernels of interpolate
+    align_corners = False if interpolation in ['bilinear', 'bicubic'] else None
+    antialias = antialias if interpolation in ['bilinear', 'bicubic'] else False
+    return NF.interpolate(image[None], size=output_size, mode=interpolation, align_corners=align_corners, antialias=antialias)[0]
+
+
+'''resizesegtarget'''
+def resizesegtarget(seg_target, output_size, interpolation='nearest-exact'):
+    return NF.interpolate(seg_target[None, None], size=output_size, mode=interpolation)[0, 0]
+
+
+'''getresizedoutputsize'''
+def getresizedoutputsize(image_height, image_width, output_size):
+    if isinstance(output_size, collections.abc.Sequence):
+        return list(output_size)
+    short, long = min(image_height, image_width), max(image_height, image_width)
+    new_short, new_long = output_size, int(output_size * long / short)
+    return [new_short, new_long] if image_height <= image_width else [new_long, new_short]
+
+
+'''ToUint8Tensor'''
+class ToUint8Tensor(object):
+    def __init__(self):
+        pass
+    '''call'''
+    def __call__(self, data_meta):
+        if 'image' in data_meta and data_meta['image'] is not None and not isinstance(data_meta['image'], torch.Tensor):
+            image = np.array(data_meta['image'], dtype=np.uint8)
+            if image.ndim == 2: image = image[..., None]
+            data_meta['image'] = torch.from_numpy(image).permute(2, 0, 1)
+        if 'seg_target' in data_meta and data_meta['seg_target'] is not None and not isinstance(data_meta['seg_target'], torch.Tensor):
+            data_meta['seg_target'] = torch.from_numpy(np.array(data_meta['seg_target'], dtype=np.uint8))
+        return data_meta
+
+
+'''TensorResize'''
+class TensorResize(object):
+    def __init__(self, output_size, image_interpolation='bilinear', seg_target_interpolation='nearest-exact', antialias=True):
+        # assert
+        assert isinstance(output_size, int) or \
+               (isinstance(output_size, collections.abc.Sequence) and len(output_size) == 2)
+        # set attributes
+        self.output_size = output_size
+        self.antialias = antialias
+        self.image_interpolation = image_interpolation
+        self.seg_target_interpolation = seg_target_interpolation
+    '''call'''
+    def __call__(self, data_meta):
+        output_size = getresizedoutputsize(*data_meta['image'].shape[-2:], self.output_size)
+        if data_meta.get('image') is not None:
+            data_meta['image'] = resizeimage(data_meta['image'], output_size, self.image_interpolation, self.antialias)
+        if data_meta.get('seg_target') is not None:
+            data_meta['seg_target'] = resizesegtarget(data_meta['seg_target'], output_size, self.seg_target_interpolation)
+        return data_meta
+
+
+'''TensorCenterCrop'''
+class TensorCenterCrop(object):
+    def __init__(self, output_size):
+        # set attributes
+        if isinstance(output_size, numbers.Number):
+            output_size = (int(output_size), int(output_size))
+        self.output_size = output_size
+    '''call'''
+    def __call__(self, data_meta):
+        image_height, image_width = data_meta['image'].shape[-2:]
+        if image_height < self.output_size[0] or image_width < self.output_size[1]:
+            if data_meta.get('image') is not None:
+                data_meta['image'] = F.center_crop(data_meta['image'], self.output_size)
+            if data_meta.get('seg_target') is not None:
+                data_meta['seg_target'] = F.center_crop(data_meta['seg_target'][None], self.output_size)[0]
+            return data_meta
+        top, left = int(round((image_height - self.output_size[0]) / 2.0)), int(round((image_width - self.output_size[1]) / 2.0))
+        for key in ['image', 'seg_target']:
+            if data_meta.get(key) is not None:
+                data_meta[key] = data_meta[key][..., top: top + self.output_size[0], left: left + self.output_size[1]]
+        return data_meta
+
+
+'''TensorPad'''
+class TensorPad(object):
+    def __init__(self, padding, image_fill=0, seg_target_fill=255, padding_mode='constant'):
+        # assert
+        assert isinstance(padding, (numbers.Number, tuple, list))
+        assert padding_mode in ['constant', 'edge', 'reflect', 'symmetric']
+        if isinstance(padding, collections.abc.Sequence):
+            assert len(padding) in [2, 4]
+        # set attributes
+        self.padding = list(padding) if isinstance(padding, collections.abc.Sequence) else padding
+        self.image_fill = image_fill
+        self.seg_target_fill = seg_target_fill
+        self.padding_mode = padding_mode
+    '''call'''
+    def __call__(self, data_meta):
+        if data_meta.get('image') is not None:
+            data_meta['image'] = F.pad(data_meta['image'], self.padding, self.image_fill, self.padding_mode)
+        if data_meta.get('seg_target') is not None:
+            data_meta['seg_target'] = F.pad(data_meta['seg_target'][None], self.padding, self.seg_target_fill, self.padding_mode)[0]
+        return data_meta
+
+
+'''TensorRandomHorizontalFlip'''
+class TensorRandomHorizontalFlip(object):
+    def __init__(self, prob=0.5):
+        # assert
+        assert isinstance(prob, numbers.Number)
+        # set attributes
+        self.prob = prob
+    '''call'''
+    def __call__(self, data_meta):
+        if random.random() < self.prob:
+            if data_meta.get('image') is not None:
+                data_meta['image'] = data_meta['image'].flip(-1)
+            if data_meta.get('seg_target') is not None:
+                data_meta['seg_target'] = data_meta['seg_target'].flip(-1)
+        return data_meta
+
+
+'''TensorRandomCrop'''
+class TensorRandomCrop(object):
+    def __init__(self, output_size):
+        # assert
+        assert isinstance(output_size, (numbers.Number, collections.abc.Sequence))
+        # set attributes
+        if isinstance(output_size, numbers.Number):
+            output_size = (output_size, output_size)
+        self.output_size = output_size
+    '''call'''
+    def __call__(self, data_meta):
+        image_height, image_width = data_meta['image'].shape[-2:]
+        output_height, output_width = min(image_height, self.output_size[0]), min(image_width, self.output_size[1])
+        top, left = random.randint(0, image_height - output_height), random.randint(0, image_width - output_width)
+        if data_meta.get('image') is not None:
+            data_meta['image'] = data_meta['image'][..., top: top + output_height, left: left + output_width]
+        if data_meta.get('seg_target') is not None:
+            data_meta['seg_target'] = data_meta['seg_target'][..., top: top + output_height, left: left + output_width]
+        return data_meta
+
+
+'''TensorRandomResizedCrop'''
+class TensorRandomResizedCrop(object):
+    def __init__(self, output_size, scale=(0.08, 1.0), ratio=(3. / 4., 4. / 3.), flip_prob=0.0, image_interpolation='bilinear', seg_target_interpolation='nearest-exact', antialias=True):
+        # assert
+        assert isinstance(output_size, int) or \
+               (isinstance(output_size, collections.abc.Sequence) and len(output_size) == 2)
+        if isinstance(output_size, int):
+            output_size = (output_size, output_size)
+        assert isinstance(scale, collections.abc.Sequence) and len(scale) == 2
+        assert scale[1] > scale[0]
+        assert isinstance(ratio, collections.abc.Sequence) and len(ratio) == 2
+        assert ratio[1] > ratio[0]
+        assert isinstance(flip_prob, numbers.Number)
+        # set attributes
+        self.output_size = list(output_size)
+        self.scale = scale
+        self.ratio = ratio
+        self.flip_prob = flip_prob
+        self.antialias = antialias
+        self.image_interpolation = image_interpolation
+        self.seg_target_interpolation = seg_target_interpolation
+    '''call'''
+    def __call__(self, data_meta):
+        image_height, image_width = data_meta['image'].shape[-2:]
+        top, left, height, width = RandomResizedCrop.getparams(image_width, image_height, self.scale, self.ratio)
+        flip = random.random() < self.flip_prob
+        output_size = data_meta.pop('output_size', None)
+        output_size = [output_size, output_size] if output_size is not None else self.output_size
+        # crop is a view and flip is applied on the output, so each sample is interpolated only once
+        if data_meta.get('image') is not None:
+            image = resizeimage(data_meta['image'][..., top: top + height, left: left + width], output_size, self.image_interpolation, self.antialias)
+            data_meta['image'] = image.flip(-1) if flip else image
+        if data_meta.get('seg_target') is not None:
+            seg_target = resizesegtarget(data_meta['seg_target'][top: top + height, left: left + width], output_size, self.seg_target_interpolation)
+            data_meta['seg_target'] = seg_target.flip(-1) if flip else seg_target
+        return data_meta
+
+
+'''TensorNormalize'''
+class TensorNormalize(object):
+    def __init__(self, mean, std, scale=1.0 / 255.0):
+        # set attributes
+        self.mean = mean
+        self.std = std
+        self.scale = scale
+        mean, std = torch.tensor(mean, dtype=torch.float32), torch.tensor(std, dtype=torch.float32)
+        self.multiplier = (scale / std).view(-1, 1, 1)
+        self.offset = (mean / std).view(-1, 1, 1)
+    '''call'''
+    def __call__(self, data_meta):
+        if data_meta.get('image') is not None:
+            data_meta['image'] = data_meta['image'].to(torch.float32).mul_(self.multiplier).sub_(self.offset)
+        if data_meta.get('seg_target') is not None:
+            data_meta['seg_target'] = data_meta['seg_target'].contiguous()
+        return data_meta
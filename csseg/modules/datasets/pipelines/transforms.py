@@ -12,7 +12,6 @@ import numpy as np
 import collections
 import torchvision.transforms.functional as F
 from PIL import Image
-from ...utils import BaseModuleBuilder
 
 
 '''Resize'''
@@ -29,9 +28,21 @@ class Resize(object):
         self.seg_target_interpolation = getattr(Image, seg_target_interpolation)
     '''call'''
     def __call__(self, data_meta):
-        data_meta = self.resize('image', data_meta, self.output_size, self.image_interpolation, **self.extra_kwargs)
-        data_meta = self.resize('seg_target', data_meta, self.output_size, self.seg_target_interpolation, **self.extra_kwargs)
+        output_size = self.output_size
+        # an image decoded at a reduced resolution is resized to exactly the size of its seg_target
+        if data_meta.get('seg_target') is not None and data_meta['image'].size != data_meta['seg_target'].size and isinstance(output_size, int):
+            width, height = data_meta['seg_target'].size
+            output_size = [output_size, int(output_size * width / height)] if height <= width else [int(output_size * height / width), output_size]
+        data_meta = self.resize('image', data_meta, output_size, self.image_interpolation, **self.extra_kwargs)
+        data_meta = self.resize('seg_target', data_meta, output_size, self.seg_target_interpolation, **self.extra_kwargs)
         return data_meta
+    '''mindecodesize'''
+    def mindecodesize(self, image_width, image_height):
+        if isinstance(self.output_size, int):
+            factor = self.output_size / min(image_width, image_height)
+        else:
+            factor = max(self.output_size[0] / image_height, self.output_size[1] / image_width)
+        return (math.ceil(image_width * min(factor, 1)), math.ceil(image_height * min(factor, 1)))
     '''resize'''
     @staticmethod
     def resize(key, data_meta, output_size, interpolation, **kwargs):
@@ -228,6 +239,7 @@ class RandomResizedCrop(object):
         assert hasattr(Image, image_interpolation) and hasattr(Image, seg_target_interpolation)
         # set attributes
         self.output_size = output_size
+        self.max_output_size = None
         self.scale = scale
         self.ratio = ratio
         self.extra_kwargs = kwargs
@@ -235,35 +247,71 @@ class RandomResizedCrop(object):
         self.seg_target_interpolation = getattr(Image, seg_target_interpolation)
     '''call'''
     def __call__(self, data_meta):
-        image = data_meta['image']
+        image_width, image_height = data_meta['image'].size
+        # the output size scheduled for the batch, if any, overrides the configured one
+        output_size = data_meta.pop('output_size', None)
+        output_size = (output_size, output_size) if output_size is not None else self.output_size
+        # the crop is sampled on the seg_target, for an image decoded at a reduced resolution the box is scaled accordingly
+        if data_meta.get('seg_target') is not None and data_meta['seg_target'].size != (image_width, image_height):
+            target_width, target_height = data_meta['seg_target'].size
+            top, left, height, width = self.samplecrop(data_meta, target_width, target_height)
+            scale_x, scale_y = image_width / target_width, image_height / target_height
+            box = (left * scale_x, top * scale_y, (left + width) * scale_x, (top + height) * scale_y)
+            data_meta['image'] = data_meta['image'].resize(output_size[::-1], self.image_interpolation, box=box)
+        else:
+            top, left, height, width = self.samplecrop(data_meta, image_width, image_height)
+            data_meta = self.resizedcrop('image', data_meta, top, left, height, width, output_size, self.image_interpolation, **self.extra_kwargs)
+        data_meta = self.resizedcrop('seg_target', data_meta, top, left, height, width, output_size, self.seg_target_interpolation, **self.extra_kwargs)
+        return data_meta
+    '''samplecrop'''
+    def samplecrop(self, data_meta, image_width, image_height):
+        return self.getparams(image_width, image_height, self.scale, self.ratio)
+    '''mindecodesize'''
+    def mindecodesize(self, image_width, image_height):
+        # the smallest crop that getparams can sample must still cover the output size
+        area = image_width * image_height
+        min_width = min(math.sqrt(area * self.scale[0] * self.ratio[0]), image_width)
+        min_height = min(math.sqrt(area * self.scale[0] / self.ratio[1]), image_height)
+        if image_width / image_height < self.ratio[0]: min_height = min(min_height, image_width / self.ratio[0])
+        if image_width / image_height > self.ratio[1]: min_width = min(min_width, image_height * self.ratio[1])
+        # with progressive resolution, the largest output size of the schedule may exceed the configured one
+        output_height, output_width = self.output_size
+        if self.max_output_size is not None:
+            output_height, output_width = max(output_height, self.max_output_size), max(output_width, self.max_output_size)
+        factor = max(output_width / min_width, output_height / min_height)
+        return (math.ceil(image_width * min(factor, 1)), math.ceil(image_height * min(factor, 1)))
+    '''setmaxoutputsize'''
+    def setmaxoutputsize(self, max_output_size):
+        self.max_output_size = max_output_size
+    '''getparams'''
+    @staticmethod
+    def getparams(image_width, image_height, scale, ratio):
         top, left, height, width = None, None, None, None
-        area = image.size[0] * image.size[1]
+        area = image_width * image_height
         for _ in range(10):
-            output_area = random.uniform(*self.scale) * area
-            log_ratio = (math.log(self.ratio[0]), math.log(self.ratio[1]))
+            output_area = random.uniform(*scale) * area
+            log_ratio = (math.log(ratio[0]), math.log(ratio[1]))
             aspect_ratio = math.exp(random.uniform(*log_ratio))
             width = int(round(math.sqrt(output_area * aspect_ratio)))
             height = int(round(math.sqrt(output_area / aspect_ratio)))
-            if width <= image.size[0] and height <= image.size[1]:
-                top = random.randint(0, image.size[1] - height)
-                left = random.randint(0, image.size[0] - width)
+            if width <= image_width and height <= image_height:
+                top = random.randint(0, image_height - height)
+                left = random.randint(0, image_width - width)
                 break
         if top is None or left is None:
-            in_ratio = image.size[0] / image.size[1]
-            if (in_ratio < min(self.ratio)):
-                width = image.size[0]
-                height = int(round(width / min(self.ratio)))
-            elif (in_ratio > max(self.ratio)):
-                height = image.size[1]
-                width = int(round(height * max(self.ratio)))
+            in_ratio = image_width / image_height
+            if (in_ratio < min(ratio)):
+                width = image_width
+                height = int(round(width / min(ratio)))
+            elif (in_ratio > max(ratio)):
+                height = image_height
+                width = int(round(height * max(ratio)))
             else:
-                width = image.size[0]
-                height = image.size[1]
-            top = (image.size[1] - height) // 2
-            left = (image.size[0] - width) // 2
-        data_meta = self.resizedcrop('image', data_meta, top, left, height, width, self.output_size, self.image_interpolation, **self.extra_kwargs)
-        data_meta = self.resizedcrop('seg_target', data_meta, top, left, height, width, self.output_size, self.seg_target_interpolation, **self.extra_kwargs)
-        return data_meta
+                width = image_width
+                height = image_height
+            top = (image_height - height) // 2
+            left = (image_width - width) // 2
+        return top, left, height, width
     '''resizecrop'''
     @staticmethod
     def resizedcrop(key, data_meta, top, left, height, width, size, interpolation, **kwargs):
@@ -272,6 +320,37 @@ class RandomResizedCrop(object):
         return data_meta
 
 
+'''ClassAwareRandomResizedCrop'''
+class ClassAwareRandomResizedCrop(RandomResizedCrop):
+    def __init__(self, output_size, scale=(0.08, 1.0), ratio=(3. / 4., 4. / 3.), image_interpolation='BILINEAR', seg_target_interpolation='NEAREST', class_aware_prob=0.5, **kwargs):
+        super(ClassAwareRandomResizedCrop, self).__init__(
+            output_size=output_size, scale=scale, ratio=ratio, image_interpolation=image_interpolation, seg_target_interpolation=seg_target_interpolation, **kwargs
+        )
+        # assert
+        assert 0 <= class_aware_prob <= 1
+        # set attributes
+        self.class_aware_prob = class_aware_prob
+        self.labels_lut = None
+    '''setlabels'''
+    def setlabels(self, labels):
+        # the labels of the current task, set by BaseDataset, in the raw label space of the seg_target
+        self.labels_lut = np.zeros((256,), dtype=bool)
+        self.labels_lut[[label for label in labels if 0 < label < 255]] = True
+    '''samplecrop'''
+    def samplecrop(self, data_meta, image_width, image_height):
+        top, left, height, width = self.getparams(image_width, image_height, self.scale, self.ratio)
+        if self.labels_lut is None or data_meta.get('seg_target') is None or random.random() >= self.class_aware_prob:
+            return top, left, height, width
+        # the crop keeps its sampled size, but is placed so that it contains a random pixel of the current task classes
+        positions = np.flatnonzero(self.labels_lut[np.asarray(data_meta['seg_target'], dtype=np.uint8)])
+        if positions.size == 0:
+            return top, left, height, width
+        y, x = divmod(int(positions[random.randrange(positions.size)]), image_width)
+        top = random.randint(max(0, y - height + 1), min(y, image_height - height))
+        left = random.randint(max(0, x - width + 1), min(x, image_width - width))
+        return top, left, height, width
+
+
 '''ColorJitter'''
 class ColorJitter(object):
     def __init__(self, brightness=None, contrast=None, saturation=None, hue=None, **kwargs):
@@ -362,19 +441,8 @@ class Compose(object):
         for transform in self.transforms:
             data_meta = transform(data_meta)
         return data_meta
-
-
-'''DataTransformBuilder'''
-class DataTransformBuilder(BaseModuleBuilder):
-    REGISTERED_MODULES = {
-        'Resize': Resize, 'CenterCrop': CenterCrop, 'Pad': Pad, 'Lambda': Lambda, 'RandomRotation': RandomRotation, 
-        'RandomHorizontalFlip': RandomHorizontalFlip, 'RandomVerticalFlip': RandomVerticalFlip, 'ToTensor': ToTensor,
-        'Normalize': Normalize, 'RandomCrop': RandomCrop, 'RandomResizedCrop': RandomResizedCrop, 'ColorJitter': ColorJitter,
-    }
-    '''build'''
-    def build(self, transform_cfg):
-        return super().build(transform_cfg)
-
-
-'''BuildDataTransform'''
-BuildDataTransform = DataTransformBuilder().build
\ No newline at end of file
+    '''mindecodesize'''
+    def mindecodesize(self, image_width, image_height):
+        # only the first transform sees the decoded image, so only it can bound the decoding resolution
+        if not self.transforms or not hasattr(self.transforms[0], 'mindecodesize'): return None
+        return self.transforms[0].mindecodesize(image_width, image_height)
\ No newline at end of file
@@ -0,0 +1,96 @@
+'''
+Function:
+    Implementation of ReadAhead
+Author:
+    Zhenchao Jin
+'''
+import os
+import time
+import torch
+import collections
+import numpy as np
+import concurrent.futures
+
+
+'''ReadAhead'''
+class ReadAhead():
+    def __init__(self, depth=16, num_threads=4):
+        # assert
+        assert depth > 0 and num_threads > 0
+        # set attributes
+        self.depth = depth
+        self.num_threads = num_threads
+        self.batch_size = 1
+        self.setup(num_workers=0, batch_size=1)
+    '''setup'''
+    def setup(self, num_workers, batch_size, prefetch_factor=2):
+        # the sampler publishes the upcoming indices of every worker into a ring in shared memory, which must cover the batches queued for the worker plus the read-ahead depth
+        num_workers = max(1, num_workers)
+        self.batch_size = batch_size
+        self.rings = torch.full((num_workers, self.depth + (prefetch_factor + 2) * batch_size), -1, dtype=torch.int64).share_memory_()
+        self.heads = torch.zeros((num_workers,), dtype=torch.int64).share_memory_()
+        self.generation = torch.zeros((1,), dtype=torch.int64).share_memory_()
+        # io wait in seconds, number of reads and number of reads served by the read-ahead, per worker
+        self.io_stats = torch.zeros((num_workers, 3), dtype=torch.float64).share_memory_()
+        self.resetlocal()
+    '''resetlocal'''
+    def resetlocal(self):
+        self.pid, self.executor, self.futures = None, None, collections.OrderedDict()
+        self.cursor, self.local_generation = 0, -1
+    '''reset'''
+    def reset(self):
+        # called by the sampler at the start of every pass, when the dataloader also restarts assigning batches from the first worker
+        self.heads.zero_()
+        self.generation += 1
+    '''publish'''
+    def publish(self, position, index):
+        # the dataloader hands the batches to the workers in turn
+        worker_id = (position // self.batch_size) % self.rings.shape[0]
+        head = int(self.heads[worker_id])
+        self.rings[worker_id, head % self.rings.shape[1]] = index
+        self.heads[worker_id] = head + 1
+    '''fetch'''
+    def fetch(self, index, readfunc):
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id = worker_info.id if worker_info is not None else 0
+        # thread pools do not survive fork, so every process creates its own
+        if self.pid != os.getpid():
+            self.resetlocal()
+            self.pid, self.executor = os.getpid(), concurrent.futures.ThreadPoolExecutor(max_workers=self.num_threads)
+        if self.local_generation != int(self.generation[0]):
+            self.cursor, self.local_generation = 0, int(self.generation[0])
+        self.submit(worker_id, index, readfunc)
+        # wait for the bytes of index, which are read in place if they were not requested ahead
+        start_time, future = time.perf_counter(), self.futures.pop(index, None)
+        result = future.result() if future is not None else readfunc(index)
+        io_stats = self.io_stats[worker_id % self.io_stats.shape[0]]
+        io_stats += torch.tensor([time.perf_counter() - start_time, 1.0, float(future is not None)], dtype=torch.float64)
+        return result
+    '''submit'''
+    def submit(self, worker_id, index, readfunc):
+        if worker_id >= self.rings.shape[0]: return
+        ring, head, ring_size = self.rings[worker_id].numpy(), int(self.heads[worker_id]), self.rings.shape[1]
+        # locate index among the published positions not consumed yet, entries overwritten in the meantime are simply missed
+        start = max(self.cursor, head - ring_size)
+        positions = np.arange(start, head)
+        matches = np.nonzero(ring[positions % ring_size] == index)[0]
+        if matches.size == 0: return
+        self.cursor = int(positions[matches[0]]) + 1
+        for position in range(self.cursor, min(head, self.cursor + self.depth)):
+            future_index = int(ring[position % ring_size])
+            if future_index < 0 or future_index in self.futures: continue
+            self.futures[future_index] = self.executor.submit(readfunc, future_index)
+        # bytes requested ahead but never consumed, e.g., after an interrupted pass, are dropped
+        while len(self.futures) > 2 * self.depth:
+            self.futures.popitem(last=False)
+    '''iowaitstats'''
+    def iowaitstats(self, reset=False):
+        total, num_reads, num_hits = self.io_stats.sum(dim=0).tolist()
+        if reset: self.io_stats.zero_()
+        if num_reads == 0: return {'total': 0.0, 'mean': 0.0, 'hit_ratio': 0.0}
+        return {'total': total, 'mean': total / num_reads, 'hit_ratio': num_hits / num_reads}
+    '''getstate'''
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update({'pid': None, 'executor': None, 'futures': collections.OrderedDict()})
+        return state
@@ -0,0 +1,134 @@
+'''
+Function:
+    Implementation of _TarShardDataset
+Author:
+    Zhenchao Jin
+'''
+import io
+import os
+import tarfile
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+from .base import _BaseDataset
+from .labelindex import LabelIndex
+
+
+'''_TarShardDataset'''
+class _TarShardDataset(_BaseDataset):
+    streaming = True
+    file_based = False
+    seg_target_suffix = '.seg.png'
+    def __init__(self, mode, dataset_cfg, source_data_generator):
+        super(_TarShardDataset, self).__init__(mode=mode, dataset_cfg=dataset_cfg)
+        # set attributes
+        tar_cfg = dataset_cfg['tar_cfg']
+        self.num_classes = source_data_generator.num_classes
+        self.classnames = source_data_generator.classnames
+        self.image_dir, self.ann_dir = source_data_generator.image_dir, source_data_generator.ann_dir
+        self.imageids = list(source_data_generator.imageids)
+        self.tar_dir = tar_cfg['tar_dir']
+        self.prefix = tar_cfg.get('prefix', dataset_cfg['set'])
+        self.shuffle_buffer = tar_cfg.get('shuffle_buffer', 256)
+        # load the sidecar index, which holds the classes of every sample so that filtering needs no decoding
+        tar_index = np.load(self.getindexpath(self.tar_dir, self.prefix), allow_pickle=False)
+        self.num_shards = int(tar_index['num_shards'])
+        positions = {str(imageid): idx for idx, imageid in enumerate(tar_index['imageids'])}
+        assert all(imageid in positions for imageid in self.imageids), f'{self.tar_dir} does not contain all images of set {self.prefix}'
+        positions = np.array([positions[imageid] for imageid in self.imageids], dtype=np.int64)
+        self.label_counts = tar_index['label_counts'][positions]
+    '''read'''
+    def read(self, index):
+        raise NotImplementedError('tar shards can only be read sequentially by iterate, use packed shards (packed_cfg) for random access')
+    '''buildlabelindex'''
+    def buildlabelindex(self, cache_dir=None, num_workers=None):
+        return LabelIndex(imageids=self.imageids, label_counts=self.label_counts)
+    '''readshard'''
+    def readshard(self, shard_id, accept):
+        # members are streamed in order, the bytes of samples rejected by accept(position, imageid) are never read
+        position, current_imageid, sample = -1, None, {}
+        with tarfile.open(self.getshardpath(self.tar_dir, self.prefix, shard_id), mode='r|') as tar:
+            for member in tar:
+                if not member.isfile(): continue
+                is_seg_target = member.name.endswith(self.seg_target_suffix)
+                imageid = member.name[:-len(self.seg_target_suffix)] if is_seg_target else os.path.splitext(member.name)[0]
+                if imageid != current_imageid:
+                    if sample: yield current_imageid, sample
+                    position, current_imageid, sample = position + 1, imageid, {}
+                    accepted = accept(position, imageid)
+                if accepted:
+                    sample['seg_target' if is_seg_target else 'image'] = tar.extractfile(member).read()
+            if sample: yield current_imageid, sample
+    '''decode'''
+    def decode(self, imageid, sample):
+        image = self.openimage(io.BytesIO(sample['image']))
+        seg_target = Image.open(io.BytesIO(sample['seg_target'])) if 'seg_target' in sample else None
+        if self.mode == 'TRAIN': assert seg_target is not None
+        width, height = seg_target.size if seg_target is not None else image.size
+        data_meta = {
+            'image': image, 'seg_target': seg_target, 'imageid': imageid, 'width': width, 'height': height,
+        }
+        return self.transforms(data_meta) if self.transforms is not None else data_meta
+    '''iterate'''
+    def iterate(self, selected_imageids, rng_seed, shuffle, worker_id, num_workers):
+        # the shard order is the same on all ranks and workers, then shards (or samples of a shard) are split between the global workers
+        shard_order = np.arange(self.num_shards)
+        if shuffle: np.random.default_rng(rng_seed[:-1]).shuffle(shard_order)
+        if self.num_shards >= num_workers:
+            assignments = [(shard_id, 0, 1) for shard_id in shard_order[worker_id::num_workers]]
+        else:
+            shard_id = shard_order[worker_id % self.num_shards]
+            assignments = [(shard_id, worker_id // self.num_shards, len(range(worker_id % self.num_shards, num_workers, self.num_shards)))]
+        rng, buffer = np.random.default_rng(rng_seed), []
+        for shard_id, part, num_parts in assignments:
+            accept = lambda position, imageid: (position % num_parts == part) and (imageid in selected_imageids)
+            for imageid, sample in self.readshard(int(shard_id), accept):
+                if not shuffle:
+                    yield self.decode(imageid, sample)
+                    continue
+                # the shuffle buffer keeps encoded bytes, samples are only decoded when they leave it
+                buffer.append((imageid, sample))
+                if len(buffer) >= self.shuffle_buffer:
+                    idx = int(rng.integers(len(buffer)))
+                    buffer[idx], buffer[-1] = buffer[-1], buffer[idx]
+                    yield self.decode(*buffer.pop())
+        rng.shuffle(buffer)
+        for imageid, sample in buffer:
+            yield self.decode(imageid, sample)
+    '''getindexpath'''
+    @staticmethod
+    def getindexpath(tar_dir, prefix):
+        return os.path.join(tar_dir, f'{prefix}.tarindex.npz')
+    '''getshardpath'''
+    @staticmethod
+    def getshardpath(tar_dir, prefix, shard_id):
+        return os.path.join(tar_dir, f'{prefix}.{shard_id:05d}.tar')
+    '''pack'''
+    @staticmethod
+    def pack(data_generator, tar_dir, prefix, shard_size=1024**3):
+        os.makedirs(tar_dir, exist_ok=True)
+        label_counts = np.zeros((len(data_generator.imageids), LabelIndex.num_label_values), dtype=np.int32)
+        shard_id, shard_nbytes = 0, 0
+        tar = tarfile.open(_TarShardDataset.getshardpath(tar_dir, prefix, 0), mode='w')
+        pbar = tqdm(data_generator.imageids)
+        pbar.set_description('Packing Images into Tar Shards')
+        for idx, imageid in enumerate(pbar):
+            imagepath, annpath = data_generator.getimagepath(imageid), data_generator.getannpath(imageid)
+            members = [(f'{imageid}{os.path.splitext(imagepath)[-1]}', imagepath)]
+            if os.path.exists(annpath):
+                label_counts[idx] = LabelIndex.countlabels(annpath)
+                members.append((f'{imageid}{_TarShardDataset.seg_target_suffix}', annpath))
+            sample_nbytes = sum(os.path.getsize(path) for _, path in members)
+            # start a new shard once the current one is full
+            if shard_nbytes > 0 and shard_nbytes + sample_nbytes > shard_size:
+                tar.close()
+                shard_id, shard_nbytes = shard_id + 1, 0
+                tar = tarfile.open(_TarShardDataset.getshardpath(tar_dir, prefix, shard_id), mode='w')
+            for name, path in members:
+                tar.add(path, arcname=name)
+            shard_nbytes += sample_nbytes
+        tar.close()
+        np.savez(
+            _TarShardDataset.getindexpath(tar_dir, prefix), imageids=np.array(data_generator.imageids), label_counts=label_counts, num_shards=np.array(shard_id + 1),
+        )
+        return True
@@ -0,0 +1,130 @@
+'''
+Function:
+    Implementation of TensorCache
+Author:
+    Zhenchao Jin
+'''
+import os
+import torch
+import hashlib
+import numpy as np
+import torch.distributed as dist
+from tqdm import tqdm
+from .labelindex import LabelIndex
+from .pipelines import Compose
+from .pipelines.transforms import ToTensor
+from .pipelines.tensortransforms import ToUint8Tensor
+
+
+'''TensorCache'''
+class TensorCache(torch.utils.data.Dataset):
+    def __init__(self, dataset, cachepath, to_float=False, transforms=None):
+        # set attributes
+        self.dataset = dataset
+        self.cachepath = cachepath
+        self.to_float = to_float
+        self.transforms = transforms
+        index = np.load(f'{cachepath}.index.npz', allow_pickle=False)
+        self.imageids = [str(imageid) for imageid in index['imageids']]
+        self.image_offsets, self.image_shapes = index['image_offsets'], index['image_shapes']
+        self.seg_target_offsets, self.seg_target_shapes = index['seg_target_offsets'], index['seg_target_shapes']
+        self.sizes = index['sizes']
+        self.images, self.seg_targets = None, None
+    '''getitem'''
+    def __getitem__(self, index):
+        if self.images is None:
+            self.images = np.memmap(f'{self.cachepath}.images.bin', dtype=np.uint8, mode='r')
+            self.seg_targets = np.memmap(f'{self.cachepath}.segtargets.bin', dtype=np.uint8, mode='r') if (self.seg_target_offsets >= 0).any() else None
+        image_offset, image_shape = int(self.image_offsets[index]), tuple(self.image_shapes[index])
+        image = torch.from_numpy(np.array(self.images[image_offset: image_offset + int(np.prod(image_shape))]).reshape(image_shape))
+        seg_target = None
+        if self.seg_target_offsets[index] >= 0:
+            seg_target_offset, seg_target_shape = int(self.seg_target_offsets[index]), tuple(self.seg_target_shapes[index])
+            seg_target = torch.from_numpy(np.array(self.seg_targets[seg_target_offset: seg_target_offset + int(np.prod(seg_target_shape))]).reshape(seg_target_shape))
+        data_meta = {
+            'image': image.to(torch.float32).div_(255) if self.to_float else image, 'seg_target': seg_target, 'imageid': self.imageids[index],
+            'width': int(self.sizes[index][0]), 'height': int(self.sizes[index][1]),
+        }
+        data_meta = self.transforms(data_meta) if self.transforms is not None else data_meta
+        return data_meta
+    '''len'''
+    def __len__(self):
+        return len(self.imageids)
+    '''getstate'''
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['images'], state['seg_targets'] = None, None
+        return state
+    '''splittransforms'''
+    @staticmethod
+    def splittransforms(transforms):
+        # everything before the tensor conversion is cached as uint8, the rest is applied when reading
+        for idx, transform in enumerate(transforms.transforms):
+            if isinstance(transform, (ToTensor, ToUint8Tensor)):
+                return Compose(transforms.transforms[:idx] + [ToUint8Tensor()]), isinstance(transform, ToTensor), Compose(transforms.transforms[idx+1:])
+        return None, None, None
+    '''getcachepath'''
+    @staticmethod
+    def getcachepath(cache_dir, subset, transform_settings, lut):
+        imageids = [subset.dataset.imageids[idx] for idx in subset.indices]
+        # the mtimes of the images and annotations on disk invalidate the cache when any of them is changed
+        mtimes = LabelIndex.getmtimes([subset.dataset.getimagepath(imageid) for imageid in imageids] + [subset.dataset.getannpath(imageid) for imageid in imageids])
+        signature = '\n'.join([
+            subset.dataset.getcachesignature(), repr(transform_settings), lut.numpy().tobytes().hex(), hashlib.md5(mtimes.tobytes()).hexdigest(),
+        ] + imageids)
+        return os.path.join(cache_dir, f'tensorcache_{hashlib.md5(signature.encode("utf-8")).hexdigest()[:16]}')
+    '''build'''
+    @classmethod
+    def build(cls, subset, transform_settings, lut, cache_dir, num_workers=None):
+        prefix_transforms, to_float, suffix_transforms = cls.splittransforms(subset.transforms)
+        if prefix_transforms is None: return None
+        is_distributed = dist.is_available() and dist.is_initialized()
+        # only rank 0 stats the files, so that all ranks agree on the cache path
+        cachepath = cls.getcachepath(cache_dir, subset, transform_settings, lut) if (not is_distributed or dist.get_rank() == 0) else None
+        if is_distributed:
+            objects = [cachepath]
+            dist.broadcast_object_list(objects, src=0)
+            cachepath = objects[0]
+        # rank 0 materializes the pipeline once, the other ranks wait for it
+        if (not is_distributed or dist.get_rank() == 0) and not os.path.exists(f'{cachepath}.index.npz'):
+            cls.materialize(subset, prefix_transforms, cachepath, num_workers)
+        if is_distributed:
+            dist.barrier()
+        return cls(dataset=subset.dataset, cachepath=cachepath, to_float=to_float, transforms=suffix_transforms)
+    '''materialize'''
+    @staticmethod
+    def materialize(subset, prefix_transforms, cachepath, num_workers=None):
+        os.makedirs(os.path.dirname(cachepath), exist_ok=True)
+        num_workers = num_workers if num_workers is not None else min(8, os.cpu_count() or 1)
+        transforms, subset.transforms = subset.transforms, prefix_transforms
+        dataloader = torch.utils.data.DataLoader(subset, batch_size=None, shuffle=False, num_workers=num_workers)
+        num_samples = len(subset)
+        imageids, sizes = [], np.zeros((num_samples, 2), dtype=np.int32)
+        image_offsets, image_shapes = np.zeros((num_samples,), dtype=np.int64), np.zeros((num_samples, 3), dtype=np.int64)
+        seg_target_offsets, seg_target_shapes = np.full((num_samples,), -1, dtype=np.int64), np.zeros((num_samples, 2), dtype=np.int64)
+        pid = os.getpid()
+        images_fp, seg_targets_fp = open(f'{cachepath}.images.bin.{pid}.tmp', 'wb'), open(f'{cachepath}.segtargets.bin.{pid}.tmp', 'wb')
+        pbar = tqdm(dataloader, total=num_samples)
+        pbar.set_description('Caching Test Tensors')
+        for idx, data_meta in enumerate(pbar):
+            image = data_meta['image'].numpy().astype(np.uint8, copy=False)
+            imageids.append(str(data_meta['imageid']))
+            sizes[idx] = (data_meta['width'], data_meta['height'])
+            image_offsets[idx], image_shapes[idx] = images_fp.tell(), image.shape
+            images_fp.write(np.ascontiguousarray(image).tobytes())
+            if data_meta.get('seg_target') is not None:
+                seg_target = data_meta['seg_target'].numpy().astype(np.uint8, copy=False)
+                seg_target_offsets[idx], seg_target_shapes[idx] = seg_targets_fp.tell(), seg_target.shape
+                seg_targets_fp.write(np.ascontiguousarray(seg_target).tobytes())
+        images_fp.close()
+        seg_targets_fp.close()
+        subset.transforms = transforms
+        # the index is written last, so an interrupted run never leaves a cache which looks complete
+        os.replace(f'{cachepath}.images.bin.{pid}.tmp', f'{cachepath}.images.bin')
+        os.replace(f'{cachepath}.segtargets.bin.{pid}.tmp', f'{cachepath}.segtargets.bin')
+        np.savez(
+            f'{cachepath}.index.{pid}.tmp.npz', imageids=np.array(imageids), sizes=sizes, image_offsets=image_offsets, image_shapes=image_shapes,
+            seg_target_offsets=seg_target_offsets, seg_target_shapes=seg_target_shapes,
+        )
+        os.replace(f'{cachepath}.index.{pid}.tmp.npz', f'{cachepath}.index.npz')
+        return True
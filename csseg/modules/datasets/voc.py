@@ -6,6 +6,8 @@ Author:
 '''
 import os
 import pandas as pd
+from .packed import _PackedDataset
+from .tarshards import _TarShardDataset
 from .base import _BaseDataset, BaseDataset
 
 
@@ -146,6 +148,11 @@ class VOCDataset(BaseDataset):
             mode=mode, task_name=task_name, task_id=task_id, dataset_cfg=dataset_cfg
         )
     '''builddatagenerator'''
-    def builddatagenerator(self, mode, dataset_cfg):
+    @classmethod
+    def builddatagenerator(cls, mode, dataset_cfg):
         data_generator = _VOCDataset(mode, dataset_cfg)
+        if dataset_cfg.get('packed_cfg') is not None:
+            data_generator = _PackedDataset(mode=mode, dataset_cfg=dataset_cfg, source_data_generator=data_generator)
+        elif dataset_cfg.get('tar_cfg') is not None:
+            data_generator = _TarShardDataset(mode=mode, dataset_cfg=dataset_cfg, source_data_generator=data_generator)
         return data_generator
\ No newline at end of file
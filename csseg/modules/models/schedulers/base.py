@@ -9,7 +9,7 @@ from torch.nn.utils import clip_grad
 
 '''BaseScheduler'''
 class BaseScheduler():
-    def __init__(self, optimizer=None, lr=0.01, min_lr=None, warmup_cfg=None, clipgrad_cfg=None, max_epochs=-1, iters_per_epoch=-1, paramwise_cfg=dict()):
+    def __init__(self, optimizer=None, lr=0.01, min_lr=None, warmup_cfg=None, clipgrad_cfg=None, max_epochs=-1, iters_per_epoch=-1, max_iters=-1, paramwise_cfg=dict()):
         # set attrs
         self.lr = lr
         self.min_lr = min_lr if min_lr is not None else lr * 0.01
@@ -18,7 +18,9 @@ class BaseScheduler():
         self.warmup_cfg = warmup_cfg
         self.clipgrad_cfg = clipgrad_cfg
         self.paramwise_cfg = paramwise_cfg
-        self.max_iters = max_epochs * iters_per_epoch
+        # in iteration-based training, max_iters is given and an epoch is a chunk of iters_per_epoch iterations
+        self.max_iters = max_iters if max_iters > 0 else max_epochs * iters_per_epoch
+        if max_iters > 0: self.max_epochs = -(-max_iters // iters_per_epoch)
         # initialize some variables
         self.cur_epoch = 0
         self.cur_iter = 0
@@ -19,6 +19,7 @@ class SchedulerBuilder(BaseModuleBuilder):
         scheduler_cfg = copy.deepcopy(scheduler_cfg)
         scheduler_type = scheduler_cfg.pop('type')
         scheduler_cfg.pop('optimizer_cfg')
+        scheduler_cfg.pop('resolution_cfg', None)
         scheduler = self.REGISTERED_MODULES[scheduler_type](optimizer=optimizer, **scheduler_cfg)
         return scheduler
 
@@ -9,10 +9,10 @@ from .base import BaseScheduler
 
 '''PolyScheduler'''
 class PolyScheduler(BaseScheduler):
-    def __init__(self, power=0.9, optimizer=None, lr=0.01, min_lr=None, warmup_cfg=None, clipgrad_cfg=None, max_epochs=-1, iters_per_epoch=-1, paramwise_cfg=dict()):
+    def __init__(self, power=0.9, optimizer=None, lr=0.01, min_lr=None, warmup_cfg=None, clipgrad_cfg=None, max_epochs=-1, iters_per_epoch=-1, max_iters=-1, paramwise_cfg=dict()):
         super(PolyScheduler, self).__init__(
             optimizer=optimizer, lr=lr, min_lr=min_lr, warmup_cfg=warmup_cfg, clipgrad_cfg=clipgrad_cfg, 
-            max_epochs=max_epochs, iters_per_epoch=iters_per_epoch, paramwise_cfg=paramwise_cfg,
+            max_epochs=max_epochs, iters_per_epoch=iters_per_epoch, max_iters=max_iters, paramwise_cfg=paramwise_cfg,
         )
         self.power = power
     '''updatelr'''
@@ -1,3 +1,4 @@
 '''initialize'''
 from .model import BuildDistributedModel
-from .dataloader import BuildDistributedDataloader
\ No newline at end of file
+from .dataloader import BuildDistributedDataloader, DeviceDataloader, InfiniteDataloader
+from .samplers import BuildSampler, SamplerBuilder, ReadAheadSampler, ProgressiveResolutionBatchSampler
\ No newline at end of file
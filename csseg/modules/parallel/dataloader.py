@@ -1,26 +1,278 @@
 '''
 Function:
-    Implementation of BuildDistributedDataloader
+    Implementation of BuildDistributedDataloader, getsampler, collaterepeatedviews, InfiniteDataloader, PinnedBufferPool and DeviceDataloader
 Author:
     Zhenchao Jin
 '''
+import os
+import json
+import time
 import copy
+import queue
 import torch
+import threading
+import collections
+from .samplers import BuildSampler, ReadAheadSampler, ProgressiveResolutionBatchSampler
+from ..datasets import SharedImageCache
 
 
 '''BuildDistributedDataloader'''
 def BuildDistributedDataloader(dataset, dataloader_cfg):
     dataloader_cfg = copy.deepcopy(dataloader_cfg)
+    # decoded image cache shared by workers and ranks on a host, which is not needed if the subset is held in memory
+    cache_cfg = dataloader_cfg.get('cache_cfg')
+    is_streaming = isinstance(dataset.data_generator, torch.utils.data.IterableDataset)
+    assert not (is_streaming and cache_cfg is not None and cache_cfg.get('max_bytes', 0) > 0), 'cache_cfg is not supported by streaming datasets (tar_cfg)'
+    if cache_cfg is not None and cache_cfg.get('max_bytes', 0) > 0 and dataset.image_cache is None and not dataset.in_memory:
+        dataset.setimagecache(SharedImageCache(name=SharedImageCache.getname(dataset.getcachesignature()), **cache_cfg))
+    # settings found by autotune.py on this machine take precedence
+    autotuned_cfg_path = dataloader_cfg.get('autotuned_cfg_path')
+    if autotuned_cfg_path is not None and os.path.exists(autotuned_cfg_path):
+        with open(autotuned_cfg_path, 'r') as fp:
+            dataloader_cfg[dataset.mode.lower()].update(json.load(fp).get(dataset.mode.lower(), {}))
     # parse
     dataloader_cfg = dataloader_cfg[dataset.mode.lower()]
     shuffle = dataloader_cfg.pop('shuffle')
     dataloader_cfg['shuffle'] = False
     dataloader_cfg['batch_size'] = dataloader_cfg.pop('batch_size_per_gpu')
     dataloader_cfg['num_workers'] = dataloader_cfg.pop('num_workers_per_gpu')
+    resolution_cfg = dataloader_cfg.pop('resolution_cfg', None)
+    if dataset.in_process:
+        dataloader_cfg['num_workers'] = 0
+    if dataloader_cfg['num_workers'] == 0:
+        dataloader_cfg.pop('prefetch_factor', None)
+        dataloader_cfg.pop('persistent_workers', None)
+    # streaming datasets split the samples between ranks and workers by themselves
+    if is_streaming:
+        assert resolution_cfg is None, 'progressive resolution is not supported by streaming datasets (tar_cfg)'
+        sampler_type = dataloader_cfg.pop('sampler_cfg', {'type': 'DistributedSampler'})['type']
+        assert sampler_type in ['DistributedSampler', 'InfiniteDistributedSampler'], f'{sampler_type} is not supported by streaming datasets (tar_cfg)'
+        iterable_dataset = dataset.data_generator
+        iterable_dataset.shuffle, iterable_dataset.batch_size, iterable_dataset.drop_last = shuffle, dataloader_cfg['batch_size'], dataloader_cfg.pop('drop_last', False)
+        dataloader_cfg.pop('shuffle')
+        iterable_dataset.infinite = sampler_type == 'InfiniteDistributedSampler'
+        return torch.utils.data.DataLoader(iterable_dataset, **dataloader_cfg)
     # sampler
-    sampler = torch.utils.data.distributed.DistributedSampler(dataset, shuffle=shuffle)
-    dataloader_cfg['sampler'] = sampler
+    sampler_cfg = dataloader_cfg.pop('sampler_cfg', {'type': 'DistributedSampler'})
+    # with repeated augmentation, every sampled image gives num_repeats views of the batch
+    if dataset.num_repeats > 1:
+        assert dataloader_cfg['batch_size'] % dataset.num_repeats == 0
+        dataloader_cfg['batch_size'] = dataloader_cfg['batch_size'] // dataset.num_repeats
+        dataloader_cfg['collate_fn'] = collaterepeatedviews
+        if sampler_cfg['type'] != 'InfiniteDistributedSampler':
+            sampler_cfg = {'type': 'RepeatedAugDistributedSampler', 'num_repeats': dataset.num_repeats, 'sampler_cfg': sampler_cfg}
+    sampler = BuildSampler(dataset=dataset, sampler_cfg={'shuffle': shuffle, **sampler_cfg})
+    # the read-ahead of the dataset learns the upcoming samples of each worker from the sampler
+    if dataset.read_ahead is not None:
+        dataset.read_ahead.setup(num_workers=dataloader_cfg['num_workers'], batch_size=dataloader_cfg['batch_size'], prefetch_factor=dataloader_cfg.get('prefetch_factor', 2))
+        sampler = ReadAheadSampler(sampler=sampler, read_ahead=dataset.read_ahead, indices=dataset.data_generator.indices, num_workers=dataloader_cfg['num_workers'])
+    # with progressive resolution, every index carries the output size of the batch it belongs to
+    if resolution_cfg is not None:
+        batch_sampler = torch.utils.data.BatchSampler(sampler, batch_size=dataloader_cfg.pop('batch_size'), drop_last=dataloader_cfg.pop('drop_last', False))
+        dataloader_cfg.pop('shuffle')
+        dataloader_cfg['batch_sampler'] = ProgressiveResolutionBatchSampler(batch_sampler=batch_sampler, **resolution_cfg)
+        # images decoded at a reduced resolution must still cover the largest output size of the schedule
+        for transform in (dataset.transforms.transforms if dataset.transforms is not None else []):
+            if hasattr(transform, 'setmaxoutputsize'): transform.setmaxoutputsize(dataloader_cfg['batch_sampler'].getmaxoutputsize())
+    else:
+        dataloader_cfg['sampler'] = sampler
     # dataloader
     dataloader = torch.utils.data.DataLoader(dataset, **dataloader_cfg)
     # return
-    return dataloader
\ No newline at end of file
+    return dataloader
+
+
+'''getsampler'''
+def getsampler(dataloader):
+    # the object whose set_epoch shuffles the data of a dataloader
+    if isinstance(dataloader.dataset, torch.utils.data.IterableDataset):
+        return dataloader.dataset
+    if isinstance(dataloader.batch_sampler, ProgressiveResolutionBatchSampler):
+        return dataloader.batch_sampler
+    return dataloader.sampler
+
+
+'''collaterepeatedviews'''
+def collaterepeatedviews(batch):
+    return torch.utils.data.default_collate([data_meta for views in batch for data_meta in views])
+
+
+'''InfiniteDataloader'''
+class InfiniteDataloader():
+    def __init__(self, dataloader, iters_per_epoch):
+        # set attributes
+        self.dataloader = dataloader
+        self.iters_per_epoch = iters_per_epoch
+        self.iterator, self.num_passes = None, 0
+    '''iter'''
+    def __iter__(self):
+        # one iterator is kept over all epochs, so that the workers are never restarted and the prefetched batches are not lost
+        for _ in range(self.iters_per_epoch):
+            if self.iterator is None:
+                self.iterator = iter(self.dataloader)
+            try:
+                data_meta = next(self.iterator)
+            except StopIteration:
+                # finite samplers or datasets are simply passed over again
+                self.num_passes += 1
+                self.sampler.set_epoch(self.num_passes)
+                self.iterator = iter(self.dataloader)
+                data_meta = next(self.iterator)
+            yield data_meta
+    '''len'''
+    def __len__(self):
+        return self.iters_per_epoch
+    '''sampler'''
+    @property
+    def sampler(self):
+        return getsampler(self.dataloader)
+    '''dataset'''
+    @property
+    def dataset(self):
+        return self.dataloader.dataset
+
+
+'''PinnedBufferPool'''
+class PinnedBufferPool():
+    def __init__(self, num_buffers_per_key=3):
+        self.num_buffers_per_key = num_buffers_per_key
+        self.buffers = {}
+    '''stage'''
+    def stage(self, tensor, device, stream):
+        # pageable tensors are copied into a reused pinned buffer first, so that the host-to-device copy can be asynchronous
+        if tensor.is_pinned():
+            return tensor.to(device, non_blocking=True)
+        key = (tuple(tensor.shape), tensor.dtype)
+        buffers = self.buffers.setdefault(key, [])
+        # only a buffer whose last copy has completed is reused, so staging never waits for a pending copy
+        entry = next((entry for entry in buffers if entry[1] is None or entry[1].query()), None)
+        if entry is None:
+            entry = [torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True), None]
+            # buffers beyond num_buffers_per_key are not kept, the caching host allocator frees them once their copies complete
+            if len(buffers) < self.num_buffers_per_key: buffers.append(entry)
+        buffer = entry[0]
+        buffer.copy_(tensor)
+        output = buffer.to(device, non_blocking=True)
+        entry[1] = torch.cuda.Event()
+        entry[1].record(stream)
+        return output
+
+
+'''DeviceDataloader'''
+class DeviceDataloader():
+    def __init__(self, dataloader, device, batch_transforms=None, num_prefetch=2, dtypes=None):
+        # set attributes
+        self.device = torch.device(device)
+        self.dataloader = dataloader
+        self.batch_transforms = batch_transforms
+        self.num_prefetch = max(1, num_prefetch)
+        self.dtypes = dtypes if dtypes is not None else {'image': torch.float32, 'seg_target': torch.long}
+        self.wait_times, self.last_wait_time = [], 0.0
+        self.buffer_pool = PinnedBufferPool(num_buffers_per_key=self.num_prefetch + 1) if self.device.type == 'cuda' else None
+    '''iter'''
+    def __iter__(self):
+        self.wait_times = []
+        iterator = self.iterprefetchcuda() if self.device.type == 'cuda' else self.iterprefetchthread()
+        try:
+            while True:
+                start_time = time.perf_counter()
+                try:
+                    data_meta = next(iterator)
+                except StopIteration:
+                    return
+                self.last_wait_time = time.perf_counter() - start_time
+                self.wait_times.append(self.last_wait_time)
+                yield data_meta
+        finally:
+            iterator.close()
+    '''process'''
+    def process(self, data_meta, stream=None):
+        data_meta = {
+            key: (self.buffer_pool.stage(value, self.device, stream) if stream is not None else value.to(self.device)) if isinstance(value, torch.Tensor) else value
+            for key, value in data_meta.items()
+        }
+        if self.batch_transforms is not None:
+            data_meta = self.batch_transforms(data_meta)
+        for key, dtype in self.dtypes.items():
+            if isinstance(data_meta.get(key), torch.Tensor):
+                data_meta[key] = data_meta[key].to(dtype)
+        return data_meta
+    '''iterprefetchcuda'''
+    def iterprefetchcuda(self):
+        # copies, conversions and batch transforms of the next batches are queued on a side stream while the current one is consumed
+        stream, staged = torch.cuda.Stream(device=self.device), collections.deque()
+        for data_meta in self.dataloader:
+            with torch.cuda.stream(stream):
+                staged.append(self.process(data_meta, stream=stream))
+            if len(staged) > self.num_prefetch:
+                yield self.handover(staged.popleft(), stream)
+        while staged:
+            yield self.handover(staged.popleft(), stream)
+    '''handover'''
+    def handover(self, data_meta, stream):
+        current_stream = torch.cuda.current_stream(self.device)
+        current_stream.wait_stream(stream)
+        for value in data_meta.values():
+            if isinstance(value, torch.Tensor) and value.is_cuda:
+                value.record_stream(current_stream)
+        return data_meta
+    '''iterprefetchthread'''
+    def iterprefetchthread(self):
+        # on cpu the next batches are fetched and transformed by a background thread
+        batches, stop_event, sentinel = queue.Queue(maxsize=self.num_prefetch), threading.Event(), object()
+        def producer():
+            try:
+                for data_meta in self.dataloader:
+                    item = self.process(data_meta)
+                    while not stop_event.is_set():
+                        try:
+                            batches.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop_event.is_set(): return
+                item = sentinel
+            except Exception as err:
+                item = err
+            while not stop_event.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is sentinel: return
+                if isinstance(item, Exception): raise item
+                yield item
+        finally:
+            stop_event.set()
+            thread.join()
+    '''waittimestats'''
+    def waittimestats(self):
+        if not self.wait_times: return {'total': 0.0, 'mean': 0.0, 'max': 0.0}
+        return {'total': sum(self.wait_times), 'mean': sum(self.wait_times) / len(self.wait_times), 'max': max(self.wait_times)}
+    '''len'''
+    def __len__(self):
+        return len(self.dataloader)
+    '''sampler'''
+    @property
+    def sampler(self):
+        if isinstance(self.dataloader, InfiniteDataloader):
+            return self.dataloader.sampler
+        return getsampler(self.dataloader)
+    '''setstartiter'''
+    def setstartiter(self, start_iter):
+        # resuming continues the sample stream and the resolution schedule where they stopped
+        dataloader = self.dataloader.dataloader if isinstance(self.dataloader, InfiniteDataloader) else self.dataloader
+        if isinstance(dataloader.batch_sampler, ProgressiveResolutionBatchSampler):
+            dataloader.batch_sampler.setstartiter(start_iter)
+        elif hasattr(dataloader.sampler, 'setstartindex'):
+            dataloader.sampler.setstartindex(start_iter * dataloader.batch_size)
+    '''dataset'''
+    @property
+    def dataset(self):
+        return self.dataloader.dataset
\ No newline at end of file
@@ -0,0 +1,4 @@
+'''initialize'''
+from .builder import BuildSampler, SamplerBuilder
+from .resolution import ProgressiveResolutionBatchSampler
+from .readahead import ReadAheadSampler
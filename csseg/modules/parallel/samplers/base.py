@@ -0,0 +1,45 @@
+'''
+Function:
+    Implementation of BaseWeightedDistributedSampler
+Author:
+    Zhenchao Jin
+'''
+import math
+import torch
+import torch.distributed as dist
+
+
+'''BaseWeightedDistributedSampler'''
+class BaseWeightedDistributedSampler(torch.utils.data.Sampler):
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, seed=0, drop_last=False, labels=None):
+        # set attributes
+        self.dataset = dataset
+        self.num_replicas = num_replicas if num_replicas is not None else dist.get_world_size()
+        self.rank = rank if rank is not None else dist.get_rank()
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.drop_last = drop_last
+        self.num_samples = len(dataset) // self.num_replicas if drop_last else math.ceil(len(dataset) / self.num_replicas)
+        self.total_size = self.num_samples * self.num_replicas
+        # images are weighted by the classes they contain, the current task classes by default
+        label_index = dataset.subset_label_index
+        self.labels = [l for l in (labels if labels is not None else dataset.labels) if l not in [0, 255]]
+        self.inverted_index = label_index.invert(self.labels)
+        self.weights = torch.from_numpy(self.getweights(len(label_index.imageids), self.inverted_index)).double()
+    '''getweights'''
+    def getweights(self, num_images, inverted_index):
+        raise NotImplementedError('not to be implemented')
+    '''iter'''
+    def __iter__(self):
+        # every rank draws the same sequence for a given seed and epoch and keeps its own slice
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch if self.shuffle else self.seed)
+        indices = torch.multinomial(self.weights, self.total_size, replacement=True, generator=generator).tolist()
+        return iter(indices[self.rank: self.total_size: self.num_replicas])
+    '''len'''
+    def __len__(self):
+        return self.num_samples
+    '''setepoch'''
+    def set_epoch(self, epoch):
+        self.epoch = epoch
@@ -0,0 +1,36 @@
+'''
+Function:
+    Implementation of SamplerBuilder and BuildSampler
+Author:
+    Zhenchao Jin
+'''
+import copy
+import torch
+from ...utils import BaseModuleBuilder
+from .infinite import InfiniteDistributedSampler
+from .rareclass import RareClassDistributedSampler
+from .repeatedaug import RepeatedAugDistributedSampler
+from .classbalanced import ClassBalancedDistributedSampler
+
+
+'''SamplerBuilder'''
+class SamplerBuilder(BaseModuleBuilder):
+    REGISTERED_MODULES = {
+        'DistributedSampler': torch.utils.data.distributed.DistributedSampler, 'ClassBalancedDistributedSampler': ClassBalancedDistributedSampler,
+        'RareClassDistributedSampler': RareClassDistributedSampler, 'InfiniteDistributedSampler': InfiniteDistributedSampler,
+        'RepeatedAugDistributedSampler': RepeatedAugDistributedSampler,
+    }
+    '''build'''
+    def build(self, dataset, sampler_cfg):
+        sampler_cfg = copy.deepcopy(sampler_cfg)
+        sampler_type = sampler_cfg.pop('type')
+        # the infinite and repeated augmentation samplers wrap the sampler given by their own sampler_cfg
+        if sampler_type in ['InfiniteDistributedSampler', 'RepeatedAugDistributedSampler']:
+            wrapped_sampler_cfg = sampler_cfg.pop('sampler_cfg', {'type': 'DistributedSampler'})
+            sampler_cfg['sampler'] = self.build(dataset, {'shuffle': sampler_cfg.pop('shuffle', True), **wrapped_sampler_cfg})
+        sampler = self.REGISTERED_MODULES[sampler_type](dataset=dataset, **sampler_cfg)
+        return sampler
+
+
+'''BuildSampler'''
+BuildSampler = SamplerBuilder().build
@@ -0,0 +1,29 @@
+'''
+Function:
+    Implementation of ClassBalancedDistributedSampler
+Author:
+    Zhenchao Jin
+'''
+import numpy as np
+from .base import BaseWeightedDistributedSampler
+
+
+'''ClassBalancedDistributedSampler'''
+class ClassBalancedDistributedSampler(BaseWeightedDistributedSampler):
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, seed=0, drop_last=False, labels=None, balance_ratio=0.5, pixel_weighted=False):
+        assert 0 <= balance_ratio <= 1
+        self.balance_ratio = balance_ratio
+        self.pixel_weighted = pixel_weighted
+        super(ClassBalancedDistributedSampler, self).__init__(
+            dataset=dataset, num_replicas=num_replicas, rank=rank, shuffle=shuffle, seed=seed, drop_last=drop_last, labels=labels,
+        )
+    '''getweights'''
+    def getweights(self, num_images, inverted_index):
+        # a class is drawn uniformly, then one of the images containing it, mixed with uniform sampling by balance_ratio
+        balanced_weights = np.zeros((num_images,), dtype=np.float64)
+        for label, (indices, pixel_counts) in inverted_index.items():
+            image_weights = pixel_counts / pixel_counts.sum() if self.pixel_weighted else np.full((len(indices),), 1.0 / len(indices))
+            balanced_weights[indices] += image_weights / len(inverted_index)
+        if len(inverted_index) == 0:
+            return np.full((num_images,), 1.0 / num_images)
+        return (1 - self.balance_ratio) / num_images + self.balance_ratio * balanced_weights
@@ -0,0 +1,38 @@
+'''
+Function:
+    Implementation of InfiniteDistributedSampler
+Author:
+    Zhenchao Jin
+'''
+import itertools
+import torch
+
+
+'''InfiniteDistributedSampler'''
+class InfiniteDistributedSampler(torch.utils.data.Sampler):
+    def __init__(self, dataset, sampler, start_index=0):
+        # set attributes
+        self.dataset = dataset
+        self.sampler = sampler
+        self.start_index = start_index
+    '''iter'''
+    def __iter__(self):
+        # the wrapped sampler is repeated with increasing epochs, the first start_index indices are skipped when resuming
+        num_samples = len(self.sampler)
+        start_epoch, offset = divmod(self.start_index, num_samples)
+        for epoch in itertools.count(start_epoch):
+            self.sampler.set_epoch(epoch)
+            indices = iter(self.sampler)
+            if epoch == start_epoch:
+                indices = itertools.islice(indices, offset, None)
+            yield from indices
+    '''len'''
+    def __len__(self):
+        return len(self.sampler)
+    '''setepoch'''
+    def set_epoch(self, epoch):
+        # the index stream is continued rather than restarted by a new epoch
+        pass
+    '''setstartindex'''
+    def setstartindex(self, start_index):
+        self.start_index = start_index
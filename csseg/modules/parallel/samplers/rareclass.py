@@ -0,0 +1,26 @@
+'''
+Function:
+    Implementation of RareClassDistributedSampler
+Author:
+    Zhenchao Jin
+'''
+import numpy as np
+from .base import BaseWeightedDistributedSampler
+
+
+'''RareClassDistributedSampler'''
+class RareClassDistributedSampler(BaseWeightedDistributedSampler):
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, seed=0, drop_last=False, labels=None, repeat_threshold=0.1):
+        assert repeat_threshold > 0
+        self.repeat_threshold = repeat_threshold
+        super(RareClassDistributedSampler, self).__init__(
+            dataset=dataset, num_replicas=num_replicas, rank=rank, shuffle=shuffle, seed=seed, drop_last=drop_last, labels=labels,
+        )
+    '''getweights'''
+    def getweights(self, num_images, inverted_index):
+        # repeat factor sampling, an image is repeated max(1, sqrt(t / f)) times for the rarest class it contains
+        repeat_factors = np.ones((num_images,), dtype=np.float64)
+        for label, (indices, pixel_counts) in inverted_index.items():
+            frequency = len(indices) / num_images
+            repeat_factors[indices] = np.maximum(repeat_factors[indices], max(1.0, np.sqrt(self.repeat_threshold / frequency)))
+        return repeat_factors / repeat_factors.sum()
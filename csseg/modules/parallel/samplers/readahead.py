@@ -0,0 +1,40 @@
+'''
+Function:
+    Implementation of ReadAheadSampler
+Author:
+    Zhenchao Jin
+'''
+import collections
+import torch
+
+
+'''ReadAheadSampler'''
+class ReadAheadSampler(torch.utils.data.Sampler):
+    def __init__(self, sampler, read_ahead, indices, num_workers=0):
+        # set attributes
+        self.sampler = sampler
+        self.read_ahead = read_ahead
+        self.indices = indices
+        self.lookahead = read_ahead.depth * max(1, num_workers)
+    '''iter'''
+    def __iter__(self):
+        # the wrapped sampler is run ahead, so that the workers see their upcoming samples before they are dispatched
+        self.read_ahead.reset()
+        pending = collections.deque()
+        for position, index in enumerate(self.sampler):
+            self.read_ahead.publish(position, self.indices[index])
+            pending.append(index)
+            if len(pending) > self.lookahead:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    '''len'''
+    def __len__(self):
+        return len(self.sampler)
+    '''setepoch'''
+    def set_epoch(self, epoch):
+        self.sampler.set_epoch(epoch)
+    '''setstartindex'''
+    def setstartindex(self, start_index):
+        if hasattr(self.sampler, 'setstartindex'):
+            self.sampler.setstartindex(start_index)
@@ -0,0 +1,29 @@
+'''
+Function:
+    Implementation of RepeatedAugDistributedSampler
+Author:
+    Zhenchao Jin
+'''
+import math
+import itertools
+import torch
+
+
+'''RepeatedAugDistributedSampler'''
+class RepeatedAugDistributedSampler(torch.utils.data.Sampler):
+    def __init__(self, dataset, sampler, num_repeats=2):
+        assert num_repeats >= 1
+        # set attributes
+        self.dataset = dataset
+        self.sampler = sampler
+        self.num_repeats = num_repeats
+    '''iter'''
+    def __iter__(self):
+        # every index gives num_repeats views, so only a 1/num_repeats share of the wrapped sampler is taken per epoch
+        return itertools.islice(iter(self.sampler), len(self))
+    '''len'''
+    def __len__(self):
+        return math.ceil(len(self.sampler) / self.num_repeats)
+    '''setepoch'''
+    def set_epoch(self, epoch):
+        self.sampler.set_epoch(epoch)
@@ -0,0 +1,49 @@
+'''
+Function:
+    Implementation of ProgressiveResolutionBatchSampler
+Author:
+    Zhenchao Jin
+'''
+import torch
+
+
+'''ProgressiveResolutionBatchSampler'''
+class ProgressiveResolutionBatchSampler(torch.utils.data.Sampler):
+    def __init__(self, batch_sampler, start_size, end_size, ramp_ratio=0.75, size_divisor=32, max_epochs=-1, max_iters=-1, start_iter=0):
+        assert 0 < ramp_ratio <= 1
+        assert max_epochs > 0 or max_iters > 0
+        # set attributes
+        self.batch_sampler = batch_sampler
+        self.start_size = start_size
+        self.end_size = end_size
+        self.ramp_ratio = ramp_ratio
+        self.size_divisor = size_divisor
+        self.max_iters = max_iters if max_iters > 0 else max_epochs * len(batch_sampler)
+        self.cur_iter = start_iter
+    '''iter'''
+    def __iter__(self):
+        # batches are counted when they are sampled, so prefetching workers still get the size of the iteration they are used at
+        for indices in self.batch_sampler:
+            output_size = self.getoutputsize(self.cur_iter)
+            self.cur_iter += 1
+            yield [(index, output_size) for index in indices]
+    '''len'''
+    def __len__(self):
+        return len(self.batch_sampler)
+    '''getoutputsize'''
+    def getoutputsize(self, cur_iter):
+        progress = min(1.0, cur_iter / max(1, self.ramp_ratio * self.max_iters))
+        output_size = self.start_size + (self.end_size - self.start_size) * progress
+        return int(round(output_size / self.size_divisor) * self.size_divisor)
+    '''getmaxoutputsize'''
+    def getmaxoutputsize(self):
+        # the output size changes monotonically, so the largest one is scheduled at the start or at the end of the ramp
+        return max(self.getoutputsize(0), self.getoutputsize(self.max_iters))
+    '''setepoch'''
+    def set_epoch(self, epoch):
+        self.batch_sampler.sampler.set_epoch(epoch)
+    '''setstartiter'''
+    def setstartiter(self, start_iter):
+        self.cur_iter = start_iter
+        if hasattr(self.batch_sampler.sampler, 'setstartindex'):
+            self.batch_sampler.sampler.setstartindex(start_iter * self.batch_sampler.batch_size)
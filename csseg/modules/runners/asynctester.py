@@ -0,0 +1,103 @@
+'''
+Function:
+    Implementation of AsyncTester
+Author:
+    Zhenchao Jin
+'''
+import copy
+import queue
+import torch
+import threading
+import torch.distributed as dist
+from ..parallel import DeviceDataloader
+
+
+'''AsyncTester'''
+class AsyncTester():
+    def __init__(self, runner, max_in_flight=1, device=None):
+        assert max_in_flight >= 1
+        # set attributes
+        self.runner = runner
+        self.device = torch.device(device) if device is not None else runner.device
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.snapshots, self.results, self.error = queue.Queue(), queue.Queue(), None
+        # weight snapshots are loaded into a copy of the segmentor, which is never wrapped by DDP
+        self.segmentor = copy.deepcopy(runner.segmentor.module).to(self.device).eval()
+        for param in self.segmentor.parameters():
+            param.requires_grad = False
+        # the results are reduced in a gloo group of their own, so that they never interleave with the collectives of training
+        self.group = dist.new_group(backend='gloo') if dist.is_available() and dist.is_initialized() else None
+        test_loader = runner.test_loader
+        if self.device != test_loader.device:
+            test_loader = DeviceDataloader(dataloader=test_loader.dataloader, device=self.device, batch_transforms=test_loader.batch_transforms, num_prefetch=test_loader.num_prefetch, dtypes=test_loader.dtypes)
+        self.test_loader = test_loader
+        self.stream = torch.cuda.Stream(device=self.device) if self.device.type == 'cuda' else None
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+    '''submit'''
+    def submit(self, cur_epoch, ckpt_path):
+        self.raiseerror()
+        self.collect()
+        # training waits here only if max_in_flight evaluations are already pending
+        self.slots.acquire()
+        self.collect()
+        snapshot = {key: value.detach().to(self.device, copy=True) for key, value in self.runner.segmentor.module.state_dict().items()}
+        event = None
+        if self.device.type == 'cuda':
+            event = torch.cuda.Event()
+            event.record(torch.cuda.current_stream(self.device))
+        self.snapshots.put((cur_epoch, ckpt_path, snapshot, event))
+    '''worker'''
+    def worker(self):
+        while True:
+            item = self.snapshots.get()
+            if item is None: return
+            cur_epoch, ckpt_path, snapshot, event = item
+            try:
+                # all ranks skip the evaluation once any of them has failed, otherwise the others would wait in its collectives
+                if not self.anyerror():
+                    self.test(cur_epoch, ckpt_path, snapshot, event)
+            except Exception as err:
+                self.error = err
+            finally:
+                del item, snapshot
+                self.slots.release()
+    '''test'''
+    def test(self, cur_epoch, ckpt_path, snapshot, event):
+        if self.stream is None:
+            self.segmentor.load_state_dict(snapshot)
+            results = self.runner.test(cur_epoch=cur_epoch, segmentor=self.segmentor, test_loader=self.test_loader, group=self.group)
+        else:
+            # the evaluation runs on a stream of its own, after the copy of the snapshot has finished
+            with torch.cuda.stream(self.stream):
+                self.stream.wait_event(event)
+                self.segmentor.load_state_dict(snapshot)
+                results = self.runner.test(cur_epoch=cur_epoch, segmentor=self.segmentor, test_loader=self.test_loader, group=self.group)
+        # the best checkpoint is updated by the training thread, which is the only one reading and writing runner.best_score
+        self.results.put((results, ckpt_path))
+    '''collect'''
+    def collect(self):
+        while True:
+            try:
+                results, ckpt_path = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.runner.updatebest(results, ckpt_path)
+    '''anyerror'''
+    def anyerror(self):
+        failed = torch.tensor([int(self.error is not None)], dtype=torch.int32)
+        if self.group is not None:
+            dist.all_reduce(failed, group=self.group)
+        if failed.item() > 0 and self.error is None:
+            self.error = RuntimeError('the background evaluation has failed on another rank')
+        return failed.item() > 0
+    '''join'''
+    def join(self):
+        self.snapshots.put(None)
+        self.thread.join()
+        self.collect()
+        self.raiseerror()
+    '''raiseerror'''
+    def raiseerror(self):
+        if self.error is not None:
+            raise self.error
@@ -5,6 +5,7 @@ Author:
     Zhenchao Jin
 '''
 import os
+import math
 import copy
 import torch
 import random
@@ -13,7 +14,8 @@ from tqdm import tqdm
 from torch.cuda.amp import GradScaler
 from ..datasets import BuildDataset, SegmentationEvaluator
 from ..models import BuildSegmentor, BuildOptimizer, BuildScheduler
-from ..parallel import BuildDistributedDataloader, BuildDistributedModel
+from .asynctester import AsyncTester
+from ..parallel import BuildDistributedDataloader, BuildDistributedModel, DeviceDataloader, InfiniteDataloader, ProgressiveResolutionBatchSampler
 from torch.distributed.algorithms.ddp_comm_hooks import default as comm_hooks
 from ..utils import Logger, touchdir, loadckpts, saveckpts, saveaspickle, symlink, loadpicklefile, setrandomseed
 
@@ -32,8 +34,15 @@ class BaseRunner():
         self.device = torch.device(cmd_args.local_rank)
         self.root_work_dir = runner_cfg['work_dir']
         self.task_work_dir = os.path.join(runner_cfg['work_dir'], f'task_{runner_cfg["task_id"]}')
-        self.save_interval_epochs = runner_cfg['save_interval_epochs']
-        self.eval_interval_epochs = runner_cfg['eval_interval_epochs']
+        # iteration-based training is used if max_iters is given, an epoch is then the chunk of iterations between two saves or evaluations
+        self.max_iters = runner_cfg['scheduler_cfg'].get('max_iters', -1) if mode == 'TRAIN' else -1
+        if self.max_iters > 0:
+            self.iters_per_epoch = math.gcd(math.gcd(runner_cfg['save_interval_iters'], runner_cfg['eval_interval_iters']), self.max_iters)
+            self.save_interval_epochs = runner_cfg['save_interval_iters'] // self.iters_per_epoch
+            self.eval_interval_epochs = runner_cfg['eval_interval_iters'] // self.iters_per_epoch
+        else:
+            self.save_interval_epochs = runner_cfg['save_interval_epochs']
+            self.eval_interval_epochs = runner_cfg['eval_interval_epochs']
         self.log_interval_iterations = runner_cfg['log_interval_iterations']
         self.choose_best_segmentor_by_metric = runner_cfg['choose_best_segmentor_by_metric']
         self.eps = runner_cfg.get('eps', 1e-6)
@@ -49,6 +58,9 @@ class BaseRunner():
         test_set = BuildDataset(mode='TEST', task_name=runner_cfg['task_name'], task_id=runner_cfg['task_id'], dataset_cfg=dataset_cfg)
         assert (runner_cfg['num_total_classes'] == train_set.num_classes if mode == 'TRAIN' else True)
         assert runner_cfg['num_total_classes'] == test_set.num_classes
+        if self.cmd_args.local_rank == 0:
+            for dataset in [train_set, test_set]:
+                for message in ([] if dataset is None else dataset.label_index.messages): self.logger_handle.warning(message)
         random.seed(runner_cfg['random_seed'])
         # build dataloaders
         dataloader_cfg = copy.deepcopy(runner_cfg['dataloader_cfg'])
@@ -57,8 +69,22 @@ class BaseRunner():
         if auto_align_train_bs:
             dataloader_cfg['train']['batch_size_per_gpu'] = total_train_bs_for_auto_check // self.cmd_args.nproc_per_node
         assert dataloader_cfg['train']['batch_size_per_gpu'] * self.cmd_args.nproc_per_node == total_train_bs_for_auto_check
+        prefetch_cfg = dataloader_cfg.pop('prefetch_cfg', {})
+        if self.max_iters > 0:
+            dataloader_cfg['train']['sampler_cfg'] = {'type': 'InfiniteDistributedSampler', 'sampler_cfg': dataloader_cfg['train'].get('sampler_cfg', {'type': 'DistributedSampler'})}
+            dataloader_cfg['train']['persistent_workers'] = True
+        # the resolution schedule is stepped per batch by the sampler, in line with the iterations of the scheduler
+        resolution_cfg = runner_cfg['scheduler_cfg'].get('resolution_cfg')
+        if resolution_cfg is not None and mode == 'TRAIN':
+            dataloader_cfg['train']['resolution_cfg'] = {**resolution_cfg, 'max_epochs': runner_cfg['scheduler_cfg'].get('max_epochs', -1), 'max_iters': self.max_iters}
         self.train_loader = BuildDistributedDataloader(dataset=train_set, dataloader_cfg=dataloader_cfg) if mode == 'TRAIN' else None
+        if self.max_iters > 0:
+            self.train_loader = InfiniteDataloader(dataloader=self.train_loader, iters_per_epoch=self.iters_per_epoch)
         self.test_loader = BuildDistributedDataloader(dataset=test_set, dataloader_cfg=dataloader_cfg)
+        # batches are staged on the device ahead of time, converted and passed through the batch transforms
+        if mode == 'TRAIN':
+            self.train_loader = DeviceDataloader(dataloader=self.train_loader, device=self.device, batch_transforms=train_set.batch_transforms, **prefetch_cfg)
+        self.test_loader = DeviceDataloader(dataloader=self.test_loader, device=self.device, batch_transforms=test_set.batch_transforms, **prefetch_cfg)
         # build segmentor
         if train_set is None:
             runner_cfg['segmentor_cfg']['num_known_classes_list'] = test_set.getnumclassespertask(runner_cfg['task_name'], test_set.tasks, runner_cfg['task_id'])
@@ -117,6 +143,10 @@ class BaseRunner():
             self.optimizer.load_state_dict(ckpts['optimizer'])
             self.scheduler.setstate(state_dict=ckpts)
             self.best_score = ckpts['best_score']
+            self.train_loader.setstartiter(self.scheduler.cur_iter)
+        # evaluations can run on weight snapshots in the background while training continues
+        async_test_cfg = runner_cfg.get('async_test_cfg')
+        self.async_tester = AsyncTester(runner=self, **async_test_cfg) if (async_test_cfg is not None and mode == 'TRAIN') else None
     '''start'''
     def start(self):
         if self.cmd_args.local_rank == 0:
@@ -124,27 +154,39 @@ class BaseRunner():
             self.logger_handle.info(f'Config Details: \n{self.runner_cfg}')
         self.beforetrainactions()
         for cur_epoch in range(self.scheduler.cur_epoch+1, self.scheduler.max_epochs+1):
-            if self.cmd_args.local_rank == 0:
+            if self.cmd_args.local_rank == 0 and self.max_iters > 0:
+                self.logger_handle.info(f'Start to train {self.runner_cfg["algorithm"]} at Task {self.runner_cfg["task_id"]}, Iteration {self.scheduler.cur_iter + 1}')
+            elif self.cmd_args.local_rank == 0:
                 self.logger_handle.info(f'Start to train {self.runner_cfg["algorithm"]} at Task {self.runner_cfg["task_id"]}, Epoch {cur_epoch}')
             self.scheduler.cur_epoch = cur_epoch
             self.train(cur_epoch=cur_epoch)
+            if self.cmd_args.local_rank == 0:
+                self.logger_handle.info(f'Data Wait Time Stats: {self.train_loader.waittimestats()}')
+            if (self.cmd_args.local_rank == 0) and (getattr(self.train_loader.dataset, 'image_cache', None) is not None):
+                self.logger_handle.info(f'Image Cache Stats: {self.train_loader.dataset.image_cache.stats()}')
+            ckpt_path = os.path.join(self.task_work_dir, f'iter_{self.scheduler.cur_iter}.pth' if self.max_iters > 0 else f'epoch_{cur_epoch}.pth')
             if ((cur_epoch % self.save_interval_epochs == 0) or (cur_epoch == self.scheduler.max_epochs)) and (self.cmd_args.local_rank == 0):
-                ckpt_path = os.path.join(self.task_work_dir, f'epoch_{cur_epoch}.pth')
                 saveckpts(ckpts=self.state(), savepath=ckpt_path)
                 symlink(ckpt_path, os.path.join(self.task_work_dir, 'latest.pth'))
-            if (cur_epoch % self.eval_interval_epochs == 0) or (cur_epoch == self.scheduler.max_epochs):
+            if ((cur_epoch % self.eval_interval_epochs == 0) or (cur_epoch == self.scheduler.max_epochs)) and (self.async_tester is not None):
+                self.async_tester.submit(cur_epoch=cur_epoch, ckpt_path=ckpt_path)
+            elif (cur_epoch % self.eval_interval_epochs == 0) or (cur_epoch == self.scheduler.max_epochs):
                 results = self.test(cur_epoch=cur_epoch)
-                if self.cmd_args.local_rank == 0:
-                    ckpt_path = os.path.join(self.task_work_dir, f'epoch_{cur_epoch}.pth')
-                    if self.best_score <= results[self.choose_best_segmentor_by_metric]:
-                        self.best_score = results[self.choose_best_segmentor_by_metric]
-                        symlink(ckpt_path, os.path.join(self.task_work_dir, 'best.pth'))
-                        saveaspickle(results, os.path.join(self.task_work_dir, 'best.pkl'))
-                    self.logger_handle.info(results)
+                self.updatebest(results, ckpt_path)
+        if self.async_tester is not None:
+            self.async_tester.join()
         self.aftertrainactions()
         if self.cmd_args.local_rank == 0:
             best_results = loadpicklefile(os.path.join(self.task_work_dir, 'best.pkl'))
             self.logger_handle.info(f'Best Result at Task {self.runner_cfg["task_id"]}: \n{best_results}')
+    '''updatebest'''
+    def updatebest(self, results, ckpt_path):
+        if self.cmd_args.local_rank != 0: return
+        if self.best_score <= results[self.choose_best_segmentor_by_metric]:
+            self.best_score = results[self.choose_best_segmentor_by_metric]
+            symlink(ckpt_path, os.path.join(self.task_work_dir, 'best.pth'))
+            saveaspickle(results, os.path.join(self.task_work_dir, 'best.pkl'))
+        self.logger_handle.info(results)
     '''aftertrainactions'''
     def aftertrainactions(self):
         pass
@@ -156,28 +198,30 @@ class BaseRunner():
         raise NotImplementedError('not to be implemented')
     '''test'''
     @torch.no_grad()
-    def test(self, cur_epoch):
+    def test(self, cur_epoch, segmentor=None, test_loader=None, group=None):
         if self.cmd_args.local_rank == 0:
             self.logger_handle.info(f'Start to test {self.runner_cfg["algorithm"]} at Task {self.runner_cfg["task_id"]}, Epoch {cur_epoch}')
-        self.segmentor.eval()
+        # the segmentor being trained is tested by default, a background tester passes its own copy, test loader and process group
+        segmentor = self.segmentor if segmentor is None else segmentor
+        test_loader = self.test_loader if test_loader is None else test_loader
+        device, is_training = next(segmentor.parameters()).device, segmentor.training
+        align_corners = getattr(segmentor, 'module', segmentor).align_corners
+        segmentor.eval()
         seg_evaluator = SegmentationEvaluator(num_classes=self.runner_cfg['num_total_classes'])
         with torch.no_grad():
-            test_loader = self.test_loader
             if self.cmd_args.local_rank == 0:
-                test_loader = tqdm(self.test_loader)
+                test_loader = tqdm(test_loader)
                 test_loader.set_description('Evaluating')
             for batch_idx, data_meta in enumerate(test_loader):
-                images = data_meta['image'].to(self.device, dtype=torch.float32)
-                seg_targets = data_meta['seg_target'].to(self.device, dtype=torch.long)
-                seg_logits = self.segmentor(images)['seg_logits']
-                seg_logits = F.interpolate(seg_logits, size=seg_targets.shape[-2:], mode='bilinear', align_corners=self.segmentor.module.align_corners)
+                images = data_meta['image'].to(device, dtype=torch.float32)
+                seg_targets = data_meta['seg_target'].to(device, dtype=torch.long)
+                seg_logits = segmentor(images)['seg_logits']
+                seg_logits = F.interpolate(seg_logits, size=seg_targets.shape[-2:], mode='bilinear', align_corners=align_corners)
                 seg_preds = seg_logits.max(dim=1)[-1]
-                seg_targets = seg_targets.cpu().numpy()
-                seg_preds = seg_preds.cpu().numpy()
                 seg_evaluator.update(seg_targets=seg_targets, seg_preds=seg_preds)
-        seg_evaluator.synchronize(device=self.device)
+        seg_evaluator.synchronize(device=device if group is None else 'cpu', group=group)
         results = seg_evaluator.evaluate()
-        self.segmentor.train()
+        segmentor.train(is_training)
         return results
     '''state'''
     def state(self):
@@ -190,6 +234,12 @@ class BaseRunner():
         return state_dict
     '''loggingtraininginfo'''
     def loggingtraininginfo(self, seg_losses_log_dict, losses_log_dict, init_losses_log_dict):
+        if isinstance(self.train_loader, DeviceDataloader):
+            seg_losses_log_dict = {**seg_losses_log_dict, 'data_time': self.train_loader.last_wait_time}
+        if getattr(self.train_loader.dataset, 'read_ahead', None) is not None:
+            seg_losses_log_dict = {**seg_losses_log_dict, 'io_wait': self.train_loader.dataset.read_ahead.iowaitstats(reset=True)['total']}
+        if isinstance(self.train_loader.sampler, ProgressiveResolutionBatchSampler):
+            losses_log_dict['resolution'] = self.train_loader.sampler.getoutputsize(self.scheduler.cur_iter)
         for key, value in seg_losses_log_dict.items():
             if key in losses_log_dict:
                 losses_log_dict[key].append(value)
@@ -0,0 +1,60 @@
+'''
+Function:
+    Implementation of Packer, which packs a dataset split into memory-mapped shards or tar shards
+Author:
+    Zhenchao Jin
+'''
+import os
+import warnings
+import argparse
+from configs import BuildConfig
+from modules import BuildDataGenerator, Logger
+from modules.datasets.packed import _PackedDataset
+from modules.datasets.tarshards import _TarShardDataset
+warnings.filterwarnings('ignore')
+
+
+'''parsecmdargs'''
+def parsecmdargs():
+    parser = argparse.ArgumentParser(description='CSSegmentation: An Open Source Continual Semantic Segmentation Toolbox Based on PyTorch.')
+    parser.add_argument('--cfgfilepath', dest='cfgfilepath', help='config file path you want to load.', type=str, required=True)
+    parser.add_argument('--packeddir', dest='packeddir', help='directory to save the packed shards.', type=str, required=True)
+    parser.add_argument('--modes', dest='modes', help='dataset modes you want to pack.', nargs='+', default=['TRAIN', 'TEST'], type=str)
+    parser.add_argument('--shardsize', dest='shardsize', help='maximum size of each shard in MB.', default=1024, type=int)
+    parser.add_argument('--packformat', dest='packformat', help='pack into memory-mapped shards or tar shards for streaming.', default='mmap', choices=['mmap', 'tar'], type=str)
+    parser.add_argument('--imageformat', dest='imageformat', help='store images as encoded bytes or raw uint8 pixels.', default='encoded', choices=['encoded', 'raw'], type=str)
+    parser.add_argument('--logfilepath', dest='logfilepath', help='file to save the logs of packing.', default='pack.log', type=str)
+    cmd_args = parser.parse_args()
+    return cmd_args
+
+
+'''Packer'''
+class Packer():
+    def __init__(self, cmd_args):
+        self.cmd_args = cmd_args
+        self.cfg = BuildConfig(cmd_args.cfgfilepath)[0]
+        self.logger_handle = Logger(logfilepath=cmd_args.logfilepath)
+    '''start'''
+    def start(self):
+        cmd_args, dataset_cfg = self.cmd_args, self.cfg.RUNNER_CFG['dataset_cfg']
+        if isinstance(dataset_cfg, list): dataset_cfg = dataset_cfg[0]
+        for mode in cmd_args.modes:
+            assert mode in ['TRAIN', 'TEST']
+            data_generator = BuildDataGenerator(mode=mode, dataset_cfg={key: value for key, value in dataset_cfg.items() if key not in ['packed_cfg', 'tar_cfg']})
+            if cmd_args.packformat == 'tar':
+                _TarShardDataset.pack(
+                    data_generator=data_generator, tar_dir=cmd_args.packeddir, prefix=data_generator.dataset_cfg['set'], shard_size=cmd_args.shardsize * 1024**2,
+                )
+            else:
+                _PackedDataset.pack(
+                    data_generator=data_generator, packed_dir=cmd_args.packeddir, prefix=data_generator.dataset_cfg['set'],
+                    shard_size=cmd_args.shardsize * 1024**2, image_format=cmd_args.imageformat,
+                )
+            self.logger_handle.info(f'Pack {mode} set of {dataset_cfg["type"]} into {os.path.abspath(cmd_args.packeddir)}')
+
+
+'''main'''
+if __name__ == '__main__':
+    cmd_args = parsecmdargs()
+    packer_client = Packer(cmd_args=cmd_args)
+    packer_client.start()
@@ -0,0 +1,155 @@
+'''
+Function:
+    Implementation of AllTasksTester, which evaluates the checkpoints of all tasks in one pass over the val set
+Author:
+    Zhenchao Jin
+'''
+import os
+import copy
+import torch
+import warnings
+import argparse
+import numpy as np
+import torch.nn.functional as F
+import torch.distributed as dist
+from tqdm import tqdm
+from configs import BuildConfig
+from modules import BuildDataset, BuildDistributedDataloader, BuildSegmentor, SegmentationEvaluator, Logger, loadckpts, saveaspickle
+from modules.parallel import DeviceDataloader
+warnings.filterwarnings('ignore')
+
+
+'''parsecmdargs'''
+def parsecmdargs():
+    parser = argparse.ArgumentParser(description='CSSegmentation: An Open Source Continual Semantic Segmentation Toolbox Based on PyTorch.')
+    parser.add_argument('--local_rank', '--local-rank', dest='local_rank', help='node rank for distributed testing.', default=0, type=int)
+    parser.add_argument('--nproc_per_node', dest='nproc_per_node', help='number of processes per node.', default=4, type=int)
+    parser.add_argument('--cfgfilepath', dest='cfgfilepath', help='config file path you want to load.', type=str, required=True)
+    parser.add_argument('--ckptname', dest='ckptname', help='checkpoint name loaded from the work dir of every task.', default='best.pth', type=str)
+    parser.add_argument('--lasttaskid', dest='lasttaskid', help='id of the last task you want to evaluate, all tasks by default.', default=-1, type=int)
+    cmd_args = parser.parse_args()
+    if torch.__version__.startswith('2.'):
+        cmd_args.local_rank = int(os.environ['LOCAL_RANK'])
+    return cmd_args
+
+
+'''AllTasksTester'''
+class AllTasksTester():
+    def __init__(self, cmd_args):
+        self.cmd_args = cmd_args
+        self.cfg = BuildConfig(cmd_args.cfgfilepath)[0]
+    '''start'''
+    def start(self):
+        # initialize
+        assert torch.cuda.is_available(), 'cuda is not available'
+        cmd_args, runner_cfg = self.cmd_args, self.cfg.RUNNER_CFG
+        dist.init_process_group(backend=runner_cfg['parallel_cfg']['backend'], init_method=runner_cfg['parallel_cfg']['init_method'])
+        torch.cuda.set_device(cmd_args.local_rank)
+        torch.backends.cudnn.allow_tf32 = False
+        torch.backends.cuda.matmul.allow_tf32 = False
+        torch.backends.cudnn.benchmark = runner_cfg['benchmark']
+        device = torch.device(cmd_args.local_rank)
+        last_task_id = cmd_args.lasttaskid if cmd_args.lasttaskid >= 0 else runner_cfg['num_tasks'] - 1
+        logger_handle = Logger(logfilepath=runner_cfg['logfilepath'])
+        # the val set of the last task contains the images and classes of all previous ones, it is read only once
+        runner_cfg_last = self.gettaskrunnercfg(runner_cfg, last_task_id)
+        test_set = BuildDataset(mode='TEST', task_name=runner_cfg['task_name'], task_id=last_task_id, dataset_cfg=runner_cfg_last['dataset_cfg'])
+        if cmd_args.local_rank == 0:
+            for message in test_set.label_index.messages: logger_handle.warning(message)
+        test_loader = BuildDistributedDataloader(dataset=test_set, dataloader_cfg=runner_cfg_last['dataloader_cfg'])
+        test_loader = DeviceDataloader(dataloader=test_loader, device=device, batch_transforms=test_set.batch_transforms, **runner_cfg_last['dataloader_cfg'].get('prefetch_cfg', {}))
+        num_classes_per_task = test_set.getnumclassespertask(runner_cfg['task_name'], test_set.tasks, last_task_id)
+        # segmentors of all tasks, each with the classifier heads known at its task
+        segmentors = []
+        for task_id in range(last_task_id + 1):
+            segmentor_cfg = copy.deepcopy(self.gettaskrunnercfg(runner_cfg, task_id)['segmentor_cfg'])
+            segmentor_cfg.pop('losses_cfgs')
+            segmentor_cfg['num_known_classes_list'] = num_classes_per_task[:task_id + 1]
+            segmentor = BuildSegmentor(segmentor_cfg=segmentor_cfg)
+            ckpts = loadckpts(os.path.join(runner_cfg['work_dir'], f'task_{task_id}', cmd_args.ckptname))
+            segmentor.load_state_dict({(key[len('module.'):] if key.startswith('module.') else key): value for key, value in ckpts['segmentor'].items()}, strict=True)
+            segmentors.append(segmentor.to(device).eval())
+        # every batch is passed through all segmentors
+        seg_evaluators = [SegmentationEvaluator(num_classes=runner_cfg['num_total_classes']) for _ in segmentors]
+        overlap, masking_value = runner_cfg_last['dataset_cfg']['overlap'], runner_cfg_last['dataset_cfg']['masking_value']
+        with torch.no_grad():
+            if cmd_args.local_rank == 0:
+                test_loader = tqdm(test_loader)
+                test_loader.set_description('Evaluating')
+            for batch_idx, data_meta in enumerate(test_loader):
+                images = data_meta['image'].to(device, dtype=torch.float32)
+                seg_targets = data_meta['seg_target'].to(device, dtype=torch.long)
+                for task_id, (segmentor, seg_evaluator) in enumerate(zip(segmentors, seg_evaluators)):
+                    task_seg_targets, selected = self.gettasktargets(seg_targets, sum(num_classes_per_task[:task_id + 1]), overlap, masking_value)
+                    if not selected.any(): continue
+                    seg_logits = segmentor(images[selected])['seg_logits']
+                    seg_logits = F.interpolate(seg_logits, size=seg_targets.shape[-2:], mode='bilinear', align_corners=segmentor.align_corners)
+                    seg_evaluator.update(seg_targets=task_seg_targets[selected], seg_preds=seg_logits.max(dim=1)[-1])
+        all_results = []
+        for seg_evaluator in seg_evaluators:
+            seg_evaluator.synchronize(device=device)
+            all_results.append(seg_evaluator.evaluate())
+        # summarize
+        summary = self.summarize(all_results, num_classes_per_task)
+        if cmd_args.local_rank == 0:
+            for task_id, results in enumerate(all_results):
+                logger_handle.info(f'Results of Task {task_id}: \n{results}')
+            logger_handle.info(f'Accuracy Matrix (mIoU of the classes of task j after training task i): \n{self.formatmatrix(summary["accuracy_matrix"])}')
+            for task_id in range(len(all_results)):
+                logger_handle.info(f'Task {task_id}: old mIoU {summary["old_miou"][task_id]}, new mIoU {summary["new_miou"][task_id]}, all mIoU {summary["all_miou"][task_id]}')
+            logger_handle.info(f'Forgetting: {summary["forgetting"]}')
+            saveaspickle({'results': all_results, **summary}, os.path.join(runner_cfg['work_dir'], 'accuracy_matrix.pkl'))
+    '''gettaskrunnercfg'''
+    @staticmethod
+    def gettaskrunnercfg(runner_cfg, task_id):
+        runner_cfg_task = copy.deepcopy(runner_cfg)
+        runner_cfg_task['task_id'] = task_id
+        for key in ['segmentor_cfg', 'dataset_cfg', 'dataloader_cfg', 'scheduler_cfg', 'parallel_cfg']:
+            if isinstance(runner_cfg_task[key], list):
+                assert len(runner_cfg_task[key]) == runner_cfg_task['num_tasks']
+                runner_cfg_task[key] = runner_cfg_task[key][task_id]
+        return runner_cfg_task
+    '''gettasktargets'''
+    @staticmethod
+    def gettasktargets(seg_targets, num_known_classes, overlap, masking_value):
+        # classes are remapped in the order of the tasks, so the classes unknown at a task are those with larger train labels,
+        # they are masked and the images are selected as the val set of that task would do
+        unknown = (seg_targets >= num_known_classes) & (seg_targets != 255)
+        selected = ((seg_targets > 0) & (seg_targets < num_known_classes)).flatten(1).any(dim=1)
+        if not overlap:
+            selected = selected & (~unknown.flatten(1).any(dim=1))
+        return torch.where(unknown, torch.full_like(seg_targets, masking_value), seg_targets), selected
+    '''summarize'''
+    @staticmethod
+    def summarize(all_results, num_classes_per_task):
+        boundaries = np.cumsum([0] + list(num_classes_per_task))
+        def meaniou(class_iou, start, end):
+            ious = [class_iou[idx] for idx in range(start, end) if class_iou[idx] != 'INVALID']
+            return float(np.mean(ious)) if ious else None
+        # the classes of task 0 (including the background) are the old ones, the classes added afterwards are the new ones
+        accuracy_matrix, old_miou, new_miou, all_miou = [], [], [], []
+        for task_id, results in enumerate(all_results):
+            accuracy_matrix.append([meaniou(results['class_iou'], boundaries[idx], boundaries[idx + 1]) if idx <= task_id else None for idx in range(len(all_results))])
+            old_miou.append(meaniou(results['class_iou'], 0, boundaries[1]))
+            new_miou.append(meaniou(results['class_iou'], boundaries[1], boundaries[task_id + 1]) if task_id > 0 else None)
+            all_miou.append(float(results['mean_iou']))
+        forgetting = {}
+        for idx in range(len(all_results) - 1):
+            history = [accuracy_matrix[task_id][idx] for task_id in range(idx, len(all_results) - 1) if accuracy_matrix[task_id][idx] is not None]
+            if history and accuracy_matrix[-1][idx] is not None:
+                forgetting[idx] = max(history) - accuracy_matrix[-1][idx]
+        return {'accuracy_matrix': accuracy_matrix, 'old_miou': old_miou, 'new_miou': new_miou, 'all_miou': all_miou, 'forgetting': forgetting}
+    '''formatmatrix'''
+    @staticmethod
+    def formatmatrix(accuracy_matrix):
+        lines = ['i\\j ' + ' '.join(f'{idx:>7d}' for idx in range(len(accuracy_matrix)))]
+        for task_id, row in enumerate(accuracy_matrix):
+            lines.append(f'{task_id:>3d} ' + ' '.join(f'{value:>7.4f}' if value is not None else f'{"-":>7s}' for value in row))
+        return '\n'.join(lines)
+
+
+'''main'''
+if __name__ == '__main__':
+    cmd_args = parsecmdargs()
+    tester_client = AllTasksTester(cmd_args=cmd_args)
+    tester_client.start()
@@ -0,0 +1,52 @@
+'''
+Function:
+    Tests of the image decoders
+Author:
+    Zhenchao Jin
+'''
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from csseg.modules.datasets.decoders import BuildImageDecoder
+
+
+'''encodejpeg'''
+def encodejpeg(width=1000, height=750, seed=0):
+    # a smooth image, so that the differences of the decoders are those of their idct and chroma upsampling
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray((rng.random((8, 10, 3)) * 255).astype(np.uint8)).resize((width, height), Image.BICUBIC)
+    fp = io.BytesIO()
+    image.save(fp, format='JPEG', quality=90)
+    return fp.getvalue()
+
+
+'''assertclose'''
+def assertclose(image, reference, max_diff=16, mean_diff=1.0):
+    assert image.shape == reference.shape
+    diff = np.abs(image.astype(np.int16) - reference.astype(np.int16))
+    assert diff.max() <= max_diff and diff.mean() <= mean_diff
+
+
+'''testdecodersclosetopil'''
+@pytest.mark.parametrize('decoder_type', ['OpenCVImageDecoder', 'TorchvisionImageDecoder'])
+def testdecodersclosetopil(decoder_type):
+    source = encodejpeg()
+    reference = np.array(BuildImageDecoder({'type': 'PILImageDecoder'})(source))
+    assertclose(np.array(BuildImageDecoder({'type': decoder_type})(source)), reference)
+
+
+'''testreduceddecoding'''
+@pytest.mark.parametrize('min_size', [(1000, 750), (500, 375), (400, 300), (250, 188), (125, 94), (60, 40)])
+def testreduceddecoding(min_size):
+    source, mindecodesize = encodejpeg(), (lambda width, height: min_size)
+    reference = np.array(BuildImageDecoder({'type': 'PILImageDecoder'})(source, mindecodesize=mindecodesize))
+    image = np.array(BuildImageDecoder({'type': 'OpenCVImageDecoder'})(source, mindecodesize=mindecodesize))
+    assert reference.shape[1] >= min(min_size[0], 1000) and reference.shape[0] >= min(min_size[1], 750)
+    assertclose(image, reference)
+
+
+'''testrawdecoder'''
+def testrawdecoder():
+    image = (np.random.default_rng(0).random((6, 7, 3)) * 255).astype(np.uint8)
+    assert (np.array(BuildImageDecoder({'type': 'RawImageDecoder'})(image.tobytes(), shape=image.shape)) == image).all()
@@ -0,0 +1,77 @@
+'''
+Function:
+    Tests of SegmentationEvaluator
+Author:
+    Zhenchao Jin
+'''
+import torch
+import numpy as np
+import pytest
+from csseg.modules.datasets.pipelines.evaluators import SegmentationEvaluator
+
+
+'''referenceconfusionmatrix'''
+def referenceconfusionmatrix(batches, num_classes):
+    # the previous numpy implementation, which accumulated a float64 matrix with one bincount per image
+    confusion_matrix = np.zeros((num_classes, num_classes))
+    for seg_targets, seg_preds in batches:
+        for seg_target, seg_pred in zip(seg_targets, seg_preds):
+            seg_target, seg_pred = seg_target.flatten(), seg_pred.flatten()
+            mask = (seg_target >= 0) & (seg_target < num_classes)
+            confusion_matrix += np.bincount(
+                num_classes * seg_target[mask].astype(int) + seg_pred[mask], minlength=num_classes**2
+            ).reshape(num_classes, num_classes)
+    return confusion_matrix
+
+
+'''referenceevaluate'''
+def referenceevaluate(hist, eps=1e-6):
+    all_accuracy = np.diag(hist).sum() / hist.sum()
+    mean_accuracy = np.mean((np.diag(hist) / (hist.sum(axis=1) + eps))[hist.sum(axis=1) != 0])
+    iou = np.diag(hist) / (hist.sum(axis=1) + hist.sum(axis=0) - np.diag(hist) + eps)
+    mean_iou = np.mean(iou[hist.sum(axis=1) != 0])
+    class_iou = dict(zip(range(hist.shape[0]), [iou[i] if m else 'INVALID' for i, m in enumerate(hist.sum(axis=1) != 0)]))
+    return {'all_accuracy': all_accuracy, 'mean_accuracy': mean_accuracy, 'mean_iou': mean_iou, 'class_iou': class_iou}
+
+
+'''randombatches'''
+def randombatches(num_classes, num_batches=5, batch_size=3, size=(17, 23), seed=0):
+    rng = np.random.default_rng(seed)
+    batches = []
+    for _ in range(num_batches):
+        # the last class never appears in the targets, so that its metrics are invalid
+        seg_targets = rng.integers(0, num_classes - 1, size=(batch_size, *size))
+        seg_targets[rng.random(seg_targets.shape) < 0.2] = 255
+        seg_preds = np.where(rng.random(seg_targets.shape) < 0.6, seg_targets, rng.integers(0, num_classes, size=seg_targets.shape))
+        seg_preds[seg_preds == 255] = 0
+        batches.append((seg_targets, seg_preds))
+    return batches
+
+
+'''testmatchesnumpyreference'''
+@pytest.mark.parametrize('num_classes', [2, 16, 21])
+def testmatchesnumpyreference(num_classes):
+    batches = randombatches(num_classes)
+    seg_evaluator = SegmentationEvaluator(num_classes=num_classes)
+    for seg_targets, seg_preds in batches:
+        seg_evaluator.update(seg_targets=torch.from_numpy(seg_targets), seg_preds=torch.from_numpy(seg_preds))
+    seg_evaluator.synchronize()
+    reference = referenceconfusionmatrix(batches, num_classes)
+    assert (seg_evaluator.confusion_matrix.cpu().numpy() == reference).all()
+    assert seg_evaluator.total_samples == sum(len(seg_targets) for seg_targets, _ in batches)
+    results, reference_results = seg_evaluator.evaluate(), referenceevaluate(reference)
+    for key in ['all_accuracy', 'mean_accuracy', 'mean_iou']:
+        assert np.isclose(results[key], reference_results[key], rtol=0, atol=1e-12)
+    assert results['class_iou'][num_classes - 1] == 'INVALID'
+    for label, iou in reference_results['class_iou'].items():
+        assert iou == 'INVALID' or np.isclose(results['class_iou'][label], iou, rtol=0, atol=1e-12)
+
+
+'''testreset'''
+def testreset():
+    seg_targets, seg_preds = randombatches(4, num_batches=1)[0]
+    seg_evaluator = SegmentationEvaluator(num_classes=4)
+    seg_evaluator.update(seg_targets=torch.from_numpy(seg_targets), seg_preds=torch.from_numpy(seg_preds))
+    seg_evaluator.reset()
+    seg_evaluator.synchronize()
+    assert seg_evaluator.total_samples == 0 and not seg_evaluator.confusion_matrix.any()
@@ -0,0 +1,51 @@
+'''
+Function:
+    Tests of the in-memory subsets
+Author:
+    Zhenchao Jin
+'''
+import os
+import numpy as np
+from PIL import Image
+from csseg.modules.datasets.labelindex import LabelIndex
+from csseg.modules.datasets.base import Subset, BaseDataset, _BaseDataset, _InMemoryDataset
+
+
+'''buildfilebacked'''
+def buildfilebacked(tmp_path, num_images=6):
+    image_dir, ann_dir = str(tmp_path / 'images'), str(tmp_path / 'anns')
+    os.makedirs(image_dir)
+    os.makedirs(ann_dir)
+    rng = np.random.default_rng(0)
+    for idx in range(num_images):
+        # images of different sizes, so that the offsets and shapes of the flat arrays are exercised
+        height, width = 8 + idx, 12 - idx
+        Image.fromarray((rng.random((height, width, 3)) * 255).astype(np.uint8)).save(os.path.join(image_dir, f'{idx}.jpg'))
+        Image.fromarray(rng.choice([0, 1, 2, 5, 255], size=(height, width)).astype(np.uint8)).save(os.path.join(ann_dir, f'{idx}.png'))
+    data_generator = _BaseDataset(mode='TRAIN', dataset_cfg={})
+    data_generator.num_classes, data_generator.classnames = 3, ['a', 'b', 'c']
+    data_generator.imageids, data_generator.image_dir, data_generator.ann_dir = [str(idx) for idx in range(num_images)], image_dir, ann_dir
+    return data_generator
+
+
+'''testinmemorymatchesfilebacked'''
+def testinmemorymatchesfilebacked(tmp_path):
+    data_generator, indices = buildfilebacked(tmp_path), [4, 1, 3, 0]
+    label_index = LabelIndex.build(data_generator, cache_dir=str(tmp_path / 'cache'), num_workers=1).select(indices)
+    in_memory_data_generator = _InMemoryDataset(
+        mode='TRAIN', dataset_cfg={}, source_data_generator=data_generator, indices=indices, label_index=label_index, num_workers=0,
+    )
+    try:
+        lut = BaseDataset.buildlabelslut([0, 1, 2], {0: 0, 1: 1, 2: 2, 255: 255}, 0)
+        seg_target_transforms = lambda seg_target: BaseDataset.remaplabels(seg_target, lut)
+        subset = Subset(data_generator, indices, seg_target_transforms=seg_target_transforms)
+        in_memory_subset = Subset(in_memory_data_generator, list(range(len(indices))), seg_target_transforms=seg_target_transforms)
+        assert len(in_memory_subset) == len(subset)
+        for index in range(len(subset)):
+            data_meta, in_memory_data_meta = subset[index], in_memory_subset[index]
+            for key in ['imageid', 'width', 'height']:
+                assert in_memory_data_meta[key] == data_meta[key]
+            assert (np.array(in_memory_data_meta['image']) == np.array(data_meta['image'])).all()
+            assert (in_memory_data_meta['seg_target'] == data_meta['seg_target']).all()
+    finally:
+        _InMemoryDataset.destroy(in_memory_data_generator.shmpath)
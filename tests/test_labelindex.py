@@ -0,0 +1,105 @@
+'''
+Function:
+    Tests of LabelIndex
+Author:
+    Zhenchao Jin
+'''
+import numpy as np
+import pytest
+from csseg.modules.datasets.labelindex import LabelIndex
+
+
+'''buildsynthetic'''
+def buildsynthetic(num_images=64, num_classes=21, seed=0):
+    rng = np.random.default_rng(seed)
+    seg_targets, label_counts = [], []
+    for _ in range(num_images):
+        classes = rng.choice(num_classes, size=rng.integers(1, 4), replace=False)
+        seg_target = rng.choice(np.append(classes, 255), size=(16, 16)).astype(np.uint8)
+        seg_targets.append(seg_target)
+        label_counts.append(np.bincount(seg_target.ravel(), minlength=LabelIndex.num_label_values).astype(np.int32))
+    return seg_targets, LabelIndex(imageids=[str(idx) for idx in range(num_images)], label_counts=np.stack(label_counts))
+
+
+'''filterperimage'''
+def filterperimage(seg_targets, labels, history_labels=None, overlap=True):
+    # the per-image selection filterimages used before the label index
+    labels = [l for l in labels if l != 0]
+    history_labels = history_labels if history_labels is not None else []
+    all_labels = labels + history_labels + [0, 255]
+    selected_indices = []
+    for idx, seg_target in enumerate(seg_targets):
+        cls = np.unique(seg_target)
+        if overlap:
+            keep = any(x in labels for x in cls)
+        else:
+            keep = any(x in labels for x in cls) and all(x in all_labels for x in cls)
+        if keep: selected_indices.append(idx)
+    return selected_indices
+
+
+'''testfilter'''
+@pytest.mark.parametrize('overlap', [True, False])
+@pytest.mark.parametrize('labels, history_labels', [
+    ([0, 16, 17, 18, 19, 20], list(range(1, 16))), ([0, 11, 12, 13, 14, 15], list(range(1, 11))), (list(range(0, 16)), []), ([20], None),
+])
+def testfilter(labels, history_labels, overlap):
+    seg_targets, label_index = buildsynthetic()
+    assert label_index.filter(labels, history_labels, overlap) == filterperimage(seg_targets, labels, history_labels, overlap)
+
+
+'''testinvert'''
+def testinvert():
+    seg_targets, label_index = buildsynthetic()
+    inverted_index = label_index.invert()
+    for label in range(LabelIndex.num_label_values):
+        indices = [idx for idx, seg_target in enumerate(seg_targets) if (seg_target == label).any()]
+        if not indices:
+            assert label not in inverted_index
+            continue
+        assert inverted_index[label][0].tolist() == indices
+        assert inverted_index[label][1].tolist() == [int((seg_targets[idx] == label).sum()) for idx in indices]
+
+
+'''testselect'''
+def testselect():
+    _, label_index = buildsynthetic()
+    subset = label_index.select([5, 2, 9])
+    assert subset.imageids == ['5', '2', '9']
+    assert (subset.label_counts == label_index.label_counts[[5, 2, 9]]).all()
+
+
+'''testcoreset'''
+def testcoreset():
+    _, label_index = buildsynthetic(num_images=256)
+    indices = label_index.coreset(0.1, seed=0)
+    assert indices == label_index.coreset(0.1, seed=0)
+    assert len(indices) < len(label_index.imageids)
+    presence = label_index.presence
+    for label in range(1, 255):
+        if presence[:, label].any(): assert presence[indices, label].any()
+
+
+'''testcountlabels'''
+def testcountlabels(tmp_path):
+    from PIL import Image
+    seg_target = np.random.default_rng(0).choice([0, 3, 255], size=(8, 8)).astype(np.uint8)
+    Image.fromarray(seg_target).save(tmp_path / 'ann.png')
+    label_counts = LabelIndex.countlabels(str(tmp_path / 'ann.png'))
+    assert label_counts.tolist() == np.bincount(seg_target.ravel(), minlength=LabelIndex.num_label_values).tolist()
+    assert not LabelIndex.countlabels(str(tmp_path / 'missing.png')).any()
+
+
+'''testcacheroundtrip'''
+def testcacheroundtrip(tmp_path):
+    _, label_index = buildsynthetic()
+    cachepath = str(tmp_path / 'labelindex.npz')
+    mtimes = np.arange(len(label_index.imageids), dtype=np.int64)
+    assert LabelIndex.save(cachepath, mtimes, label_index.label_counts) is None
+    cached_mtimes, label_counts, message = LabelIndex.load(cachepath)
+    assert (cached_mtimes == mtimes).all() and (label_counts == label_index.label_counts).all() and message is None
+    with open(cachepath, 'wb') as fp:
+        fp.write(b'corrupted')
+    cached_mtimes, label_counts, message = LabelIndex.load(cachepath)
+    assert cached_mtimes is None and label_counts is None and 'unreadable' in message
+    assert LabelIndex.load(str(tmp_path / 'missing.npz')) == (None, None, None)
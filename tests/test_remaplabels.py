@@ -0,0 +1,54 @@
+'''
+Function:
+    Tests of the label remapping of BaseDataset
+Author:
+    Zhenchao Jin
+'''
+import torch
+import numpy as np
+import pytest
+from PIL import Image
+from csseg.modules.datasets.base import BaseDataset
+
+
+'''buildmapping'''
+def buildmapping(labels, history_labels):
+    # the same label lists and mapping as BaseDataset.prepare
+    labels, history_labels = [0] + labels, [0] + history_labels
+    all_labels = [0] + history_labels[1:] + labels[1:]
+    labels_to_trainlabels_map = {label: all_labels.index(label) for label in all_labels}
+    labels_to_trainlabels_map[255] = 255
+    return labels, labels_to_trainlabels_map
+
+
+'''referenceremap'''
+def referenceremap(seg_target, labels, labels_to_trainlabels_map, masking_value):
+    # the per-pixel mapping used before the lookup table
+    seg_target = torch.from_numpy(np.array(seg_target, dtype=np.int64))
+    return seg_target.apply_(lambda x: labels_to_trainlabels_map[x] if x in labels + [255] else masking_value).numpy()
+
+
+'''randomsegtarget'''
+def randomsegtarget(seed=0, size=(19, 23)):
+    # labels of all tasks, the ignore label and values of no task
+    rng = np.random.default_rng(seed)
+    return rng.choice(list(range(21)) + [255, 100, 254], size=size).astype(np.uint8)
+
+
+'''testmatchesreference'''
+@pytest.mark.parametrize('masking_value', [0, 255])
+@pytest.mark.parametrize('labels, history_labels', [
+    (list(range(16, 21)), list(range(1, 16))), (list(range(11, 16)), list(range(1, 11))), (list(range(1, 21)), []), ([20], list(range(1, 20))),
+])
+def testmatchesreference(labels, history_labels, masking_value):
+    labels, labels_to_trainlabels_map = buildmapping(labels, history_labels)
+    lut = BaseDataset.buildlabelslut(labels, labels_to_trainlabels_map, masking_value)
+    seg_target = randomsegtarget()
+    reference = referenceremap(seg_target, labels, labels_to_trainlabels_map, masking_value)
+    # history labels are masked like the values of no task, while 255 is kept
+    assert (reference[np.isin(seg_target, history_labels)] == masking_value).all()
+    assert (reference[seg_target == 255] == 255).all()
+    for seg_target_input in [torch.from_numpy(seg_target), torch.from_numpy(seg_target).long(), seg_target, Image.fromarray(seg_target)]:
+        remapped = BaseDataset.remaplabels(seg_target_input, lut)
+        remapped = remapped.numpy() if isinstance(remapped, torch.Tensor) else remapped
+        assert remapped.shape == reference.shape and (remapped.astype(np.int64) == reference).all()
@@ -0,0 +1,63 @@
+'''
+Function:
+    Tests of the streaming tar shards
+Author:
+    Zhenchao Jin
+'''
+import os
+import types
+import itertools
+import numpy as np
+from PIL import Image
+from csseg.modules.datasets.base import IterableSubset
+from csseg.modules.datasets.tarshards import _TarShardDataset
+
+
+'''buildtarshards'''
+def buildtarshards(tmp_path, num_images=8):
+    image_dir, ann_dir = str(tmp_path / 'images'), str(tmp_path / 'anns')
+    os.makedirs(image_dir)
+    os.makedirs(ann_dir)
+    rng = np.random.default_rng(0)
+    for idx in range(num_images):
+        Image.fromarray((rng.random((8, 8, 3)) * 255).astype(np.uint8)).save(os.path.join(image_dir, f'{idx}.jpg'))
+        Image.fromarray(np.full((8, 8), idx % 3, dtype=np.uint8)).save(os.path.join(ann_dir, f'{idx}.png'))
+    source_data_generator = types.SimpleNamespace(
+        num_classes=3, classnames=['a', 'b', 'c'], image_dir=image_dir, ann_dir=ann_dir, imageids=[str(idx) for idx in range(num_images)],
+        getimagepath=lambda imageid: os.path.join(image_dir, f'{imageid}.jpg'), getannpath=lambda imageid: os.path.join(ann_dir, f'{imageid}.png'),
+    )
+    # every image goes into a shard of its own
+    _TarShardDataset.pack(source_data_generator, str(tmp_path / 'tar'), 'train', shard_size=1)
+    dataset_cfg = {'set': 'train', 'tar_cfg': {'tar_dir': str(tmp_path / 'tar'), 'shuffle_buffer': 4}}
+    return _TarShardDataset(mode='TRAIN', dataset_cfg=dataset_cfg, source_data_generator=source_data_generator)
+
+
+'''buildsubset'''
+def buildsubset(dataset, indices, rank, num_replicas, batch_size=2, infinite=False):
+    subset = IterableSubset(dataset, indices)
+    subset.rank, subset.num_replicas = rank, num_replicas
+    subset.batch_size, subset.infinite = batch_size, infinite
+    return subset
+
+
+'''testemptypartsfillquota'''
+def testemptypartsfillquota(tmp_path):
+    dataset = buildtarshards(tmp_path)
+    # a single selected image, so the parts of all but one of the global workers are empty in every pass
+    for num_replicas in [2, 4]:
+        num_yielded = []
+        for rank in range(num_replicas):
+            subset = buildsubset(dataset, [5], rank, num_replicas)
+            imageids = [data_meta['imageid'] for data_meta in subset]
+            assert set(imageids) == {'5'}
+            num_yielded.append(len(imageids))
+        assert num_yielded == [len(subset)] * num_replicas
+
+
+'''testemptypartsinfinite'''
+def testemptypartsinfinite(tmp_path):
+    dataset = buildtarshards(tmp_path)
+    for rank in range(4):
+        subset = buildsubset(dataset, [2, 3], rank, 4, infinite=True)
+        imageids = [data_meta['imageid'] for data_meta in itertools.islice(subset, 6)]
+        assert len(imageids) == 6 and set(imageids) <= {'2', '3'}
@@ -0,0 +1,27 @@
+'''
+Function:
+    Tests of TensorCache
+Author:
+    Zhenchao Jin
+'''
+import os
+import types
+import torch
+from csseg.modules.datasets.tensorcache import TensorCache
+
+
+'''testcachepathfollowsmtimes'''
+def testcachepathfollowsmtimes(tmp_path):
+    for imageid in ['0', '1']:
+        (tmp_path / f'{imageid}.jpg').write_bytes(b'image')
+        (tmp_path / f'{imageid}.png').write_bytes(b'ann')
+    dataset = types.SimpleNamespace(
+        imageids=['0', '1'], getcachesignature=lambda: 'synthetic', getimagepath=lambda imageid: str(tmp_path / f'{imageid}.jpg'),
+        getannpath=lambda imageid: str(tmp_path / f'{imageid}.png'),
+    )
+    subset, lut = torch.utils.data.Subset(dataset, [0, 1]), torch.arange(256, dtype=torch.uint8)
+    cachepath = TensorCache.getcachepath(str(tmp_path), subset, {}, lut)
+    assert TensorCache.getcachepath(str(tmp_path), subset, {}, lut) == cachepath
+    stat = os.stat(tmp_path / '1.png')
+    os.utime(tmp_path / '1.png', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert TensorCache.getcachepath(str(tmp_path), subset, {}, lut) != cachepath